@@ -0,0 +1,140 @@
+// Clientside slicing of the surface payloads built by views.spot_payload and views.table_payload.
+// Registered by main.py when CLIENTSIDE_SLICING=1, slider moves then never reach the server.
+(function () {
+    var MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'];
+    // Date.UTC of ordinal 1 (0001-01-01) in days, ordinals are python date.toordinal()
+    var ORDINAL_EPOCH = 719163;
+    var decoded = {};
+
+    function float64(store, b64) {
+        // Payloads are re-decoded only when their store changes, not on every slider move
+        if (!decoded[store] || decoded[store].key !== b64) {
+            var raw = atob(b64);
+            var bytes = new Uint8Array(raw.length);
+            for (var i = 0; i < raw.length; i++) {
+                bytes[i] = raw.charCodeAt(i);
+            }
+            decoded[store] = {key: b64, values: new Float64Array(bytes.buffer)};
+        }
+        return decoded[store].values;
+    }
+
+    function dateRows(payload, ordinals) {
+        // Rows of the requested ordinals that are on the surface, once each in date order
+        var rows = [];
+        ordinals.slice().sort(function (a, b) { return a - b; }).forEach(function (o) {
+            var i = payload.dates.indexOf(o);
+            if (i >= 0 && rows.indexOf(i) < 0) {
+                rows.push(i);
+            }
+        });
+        return rows;
+    }
+
+    function row(values, payload, ordinal) {
+        var n = payload.spots.length;
+        var i = payload.dates.indexOf(ordinal);
+        if (i < 0) {
+            return new Float64Array(n).fill(NaN);
+        }
+        return values.subarray(i * n, (i + 1) * n);
+    }
+
+    function minmaxIndices(y, nBuckets) {
+        // Same picks as data.decimate.minmax_indices
+        var n = y.length;
+        var idx = [];
+        if (n <= 2 * nBuckets + 2) {
+            for (var i = 0; i < n; i++) {
+                idx.push(i);
+            }
+            return idx;
+        }
+        var width = Math.ceil(n / nBuckets);
+        var picks = {0: true};
+        picks[n - 1] = true;
+        for (var start = 0; start < n; start += width) {
+            var lo = start, hi = start;
+            var low = Infinity, high = -Infinity;
+            for (var j = start; j < Math.min(start + width, n); j++) {
+                if (y[j] < low) {
+                    low = y[j];
+                    lo = j;
+                }
+                if (y[j] > high) {
+                    high = y[j];
+                    hi = j;
+                }
+            }
+            picks[lo] = true;
+            picks[hi] = true;
+        }
+        return Object.keys(picks).map(Number).sort(function (a, b) { return a - b; });
+    }
+
+    function decimate(x, y, maxPoints) {
+        var idx = minmaxIndices(y, Math.max(Math.floor(maxPoints / 2), 1));
+        return {
+            x: idx.map(function (i) { return x[i]; }),
+            y: idx.map(function (i) { return isNaN(y[i]) ? null : y[i]; })
+        };
+    }
+
+    function label(ordinal) {
+        var d = new Date((ordinal - ORDINAL_EPOCH) * 86400000);
+        var day = ('0' + d.getUTCDate()).slice(-2);
+        var year = ('0' + d.getUTCFullYear() % 100).slice(-2);
+        return day + '-' + MONTHS[d.getUTCMonth()] + '-' + year;
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        surface: {
+            range_text: function (dateSlider) {
+                var start = Math.min.apply(null, dateSlider), end = Math.max.apply(null, dateSlider);
+                return 'Examining data from ' + label(start) + ' to ' + label(end);
+            },
+
+            spot_figure: function (payload, dateSlider) {
+                if (!payload) {
+                    return {data: [], layout: {}};
+                }
+                var values = float64('spot', payload.values);
+                var start = row(values, payload, Math.min.apply(null, dateSlider));
+                var end = row(values, payload, Math.max.apply(null, dateSlider));
+                var diff = start.map(function (v, i) { return Math.trunc(v - end[i]); });
+                var d = decimate(payload.spots, diff, payload.max_points);
+                var s = decimate(payload.spots, start, payload.max_points);
+                var e = decimate(payload.spots, end, payload.max_points);
+                return {
+                    data: [
+                        {type: 'bar', x: d.x, y: d.y, name: 'Start-End', marker: {color: 'rgb(123, 199, 255)'}},
+                        {x: s.x, y: s.y, mode: 'lines', name: 'Start'},
+                        {x: e.x, y: e.y, mode: 'lines', name: 'End'}
+                    ],
+                    layout: payload.layout
+                };
+            },
+
+            performance_table: function (payload, dateSlider) {
+                if (!payload) {
+                    return [];
+                }
+                var values = float64('table', payload.values);
+                var nTypes = payload.plot_types.length, nSpots = payload.spots.length;
+                var records = [];
+                dateRows(payload, dateSlider).forEach(function (i) {
+                    payload.plot_types.forEach(function (plotType, p) {
+                        var record = {date: payload.labels[i], plot_type: plotType};
+                        var offset = (i * nTypes + p) * nSpots;
+                        payload.spots.forEach(function (spot, j) {
+                            var v = values[offset + j];
+                            record[spot] = isNaN(v) ? null : v;
+                        });
+                        records.push(record);
+                    });
+                });
+                return records;
+            }
+        }
+    });
+})();
@@ -0,0 +1,17 @@
+''' asv benchmarks of surface generation, loading, slicing and callback payloads.
+    Everything runs offline on synthetic surfaces against the current interpreter, from the
+    repository root:
+
+        asv run --python=same -e                                   # the working tree
+        asv run --python=same --set-commit-hash $(git rev-parse HEAD)
+        asv compare <commit> <commit>                              # regressions between commits
+        asv publish && asv preview                                 # history graphs
+
+    Results are stored per commit and machine under .asv/results. BENCH_SCALE multiplies every
+    synthetic grid size, results at different scales are kept apart as different parameters.
+'''
+import os
+import sys
+
+# asv imports the suite from this directory, make the dashboard modules importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,171 @@
+from datetime import date
+import json
+import numpy as np
+import pandas as pd
+import plotly
+import views
+from .common import scaled, synthetic_frame, synthetic_store, slider
+
+
+class SpotFigure:
+    ''' graph_against_spot latency against surface size '''
+    params = (scaled(30, 365, 1825), scaled(151, 1501))
+    param_names = ['n_dates', 'n_spots']
+
+    def setup(self, n_dates, n_spots):
+        self.store = synthetic_store(n_dates, n_spots)
+        self.frame = synthetic_frame(n_dates, n_spots)
+        self.frame['date'] = self.frame['date'].astype(object)
+        self.start, self.end = slider(self.store)
+
+    def time_spot_figure(self, n_dates, n_spots):
+        views.spot_figure(self.store, 'delta', self.start, self.end)
+
+    def time_legacy_mask_and_merge(self, n_dates, n_spots):
+        # Row scan of the long format frame that the store replaces
+        api_data = self.frame
+        start_date, end_date = date.fromordinal(self.start), date.fromordinal(self.end)
+        df = api_data.loc[(api_data['date'] == start_date) & (api_data['plot_type'] == 'delta')]
+        ref_df = api_data.loc[(api_data['date'] == end_date) & (api_data['plot_type'] == 'delta')]
+        ref_df.merge(right=df, how='left', on=['spot', 'plot_type'], suffixes=['_end', '_start'])
+
+
+def long_frame(surface, ordinals):
+    ''' Long format (date, spot, plot_type, value) frame of surface restricted to the given dates '''
+    idx = [surface.date_index[int(o)] for o in ordinals if int(o) in surface.date_index]
+    block = np.stack([surface.greek(p)[idx] for p in surface.plot_types], axis=1)
+    n_dates, n_types, n_spots = block.shape
+    return pd.DataFrame({
+        'date': np.repeat([date.fromordinal(int(surface.dates[i])) for i in idx], n_types * n_spots),
+        'spot': np.tile(surface.spots, n_dates * n_types),
+        'plot_type': np.tile(np.repeat(surface.plot_types, n_spots), n_dates),
+        'value': block.ravel(),
+    })
+
+
+def legacy_performance_table(surface, start, end, input_gap):
+    ''' performance_table as it was before the indexed builder: pivot_table(aggfunc=sum), a
+        to_numeric per column and the input_gap filter in Python
+    '''
+    df = long_frame(surface, sorted({start, end}))
+    pt = df.pivot_table(columns=['spot'], values='value', index=['date', 'plot_type'],
+                        aggfunc=sum).reset_index()
+    for i in pt.columns:
+        if isinstance(i, int):
+            pt[i] = pd.to_numeric(pt[i])
+    columns = views._table_columns([str(i) for i in pt.columns if isinstance(i, int) and i % int(input_gap) == 0])
+    data = pt[[i for i in pt.columns if isinstance(i, str) or i % int(input_gap) == 0]].to_dict('records')
+    return columns, data, views._table_styles(columns)
+
+
+class PerformanceTable:
+    ''' simple_dash_table latency against surface size '''
+    params = (scaled(30, 365, 1825), scaled(151, 1501))
+    param_names = ['n_dates', 'n_spots']
+
+    def setup(self, n_dates, n_spots):
+        self.store = synthetic_store(n_dates, n_spots)
+        self.frame = synthetic_frame(n_dates, n_spots)
+        self.frame['date'] = self.frame['date'].astype(object)
+        self.start, self.end = slider(self.store)
+
+    def time_performance_table(self, n_dates, n_spots):
+        views.performance_table(self.store, self.start, self.end, 10)
+
+    def time_legacy_performance_table(self, n_dates, n_spots):
+        legacy_performance_table(self.store, self.start, self.end, 10)
+
+    def time_legacy_mask_and_pivot(self, n_dates, n_spots):
+        # Row scan and pivot of the long format frame that the store replaces
+        api_data = self.frame
+        start_date, end_date = date.fromordinal(self.start), date.fromordinal(self.end)
+        df = api_data[(api_data['date'] == start_date) | (api_data['date'] == end_date)]
+        df.pivot_table(columns=['spot'], values='value', index=['date', 'plot_type'], aggfunc=sum).reset_index()
+
+
+class PerformanceTableWide:
+    ''' simple_dash_table latency on grids with thousands of spot columns '''
+    params = (scaled(1001, 5001, 10001), [1, 10])
+    param_names = ['n_spots', 'input_gap']
+
+    def setup(self, n_spots, input_gap):
+        self.store = synthetic_store(60, n_spots)
+        self.start, self.end = slider(self.store)
+
+    def time_performance_table(self, n_spots, input_gap):
+        views.performance_table(self.store, self.start, self.end, input_gap)
+
+    def time_legacy_performance_table(self, n_spots, input_gap):
+        legacy_performance_table(self.store, self.start, self.end, input_gap)
+
+
+class FigurePayload:
+    ''' Size and JSON serialisation time of the graph_dynamic figure against spot grid width '''
+    params = scaled(151, 1501, 15001)
+    param_names = ['n_spots']
+
+    def setup(self, n_spots):
+        store = synthetic_store(60, n_spots)
+        self.figure = views.spot_figure(store, 'delta', *slider(store))
+
+    def time_serialize(self, n_spots):
+        json.dumps(self.figure, cls=plotly.utils.PlotlyJSONEncoder)
+
+    def track_payload_bytes(self, n_spots):
+        return len(json.dumps(self.figure, cls=plotly.utils.PlotlyJSONEncoder))
+    track_payload_bytes.unit = 'bytes'
+
+
+class TablePayload:
+    ''' Size and JSON serialisation time of the performance_table output against spot grid width '''
+    params = scaled(151, 1501, 15001)
+    param_names = ['n_spots']
+
+    def setup(self, n_spots):
+        store = synthetic_store(60, n_spots)
+        self.table = views.performance_table(store, *slider(store), 1)
+
+    def time_serialize(self, n_spots):
+        json.dumps(self.table, cls=plotly.utils.PlotlyJSONEncoder)
+
+    def track_payload_bytes(self, n_spots):
+        return len(json.dumps(self.table, cls=plotly.utils.PlotlyJSONEncoder))
+    track_payload_bytes.unit = 'bytes'
+
+
+class TablePage:
+    ''' One page of the custom paged and filtered performance_table against spot grid width '''
+    params = scaled(151, 1501, 15001)
+    param_names = ['n_spots']
+
+    def setup(self, n_spots):
+        self.store = synthetic_store(60, n_spots)
+        self.start, self.end = slider(self.store)
+        self.middle = str(self.store.spots[n_spots // 2])
+
+    def time_table_page(self, n_spots):
+        views.performance_table(self.store, self.start, self.end, 1, 0, 10, '', 0)
+
+    def time_filtered_page(self, n_spots):
+        views.performance_table(self.store, self.start, self.end, 1, 0, 10, '{%s} > 0' % self.middle, 0)
+
+    def track_payload_bytes(self, n_spots):
+        return len(json.dumps(views.performance_table(self.store, self.start, self.end, 1, 0, 10, '', 0),
+                              cls=plotly.utils.PlotlyJSONEncoder))
+    track_payload_bytes.unit = 'bytes'
+
+
+class ClientsidePayload:
+    ''' One time spot_payload sent per plot_type when CLIENTSIDE_SLICING is on '''
+    params = (scaled(30, 365, 1825), scaled(151, 1501))
+    param_names = ['n_dates', 'n_spots']
+
+    def setup(self, n_dates, n_spots):
+        self.store = synthetic_store(n_dates, n_spots)
+
+    def time_spot_payload(self, n_dates, n_spots):
+        json.dumps(views.spot_payload(self.store, 'delta'), cls=plotly.utils.PlotlyJSONEncoder)
+
+    def track_payload_bytes(self, n_dates, n_spots):
+        return len(json.dumps(views.spot_payload(self.store, 'delta'), cls=plotly.utils.PlotlyJSONEncoder))
+    track_payload_bytes.unit = 'bytes'
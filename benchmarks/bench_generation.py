@@ -0,0 +1,87 @@
+import datetime
+import os
+import shutil
+import tempfile
+import numpy as np
+from data.risk_calculator import generate_book_surface, generate_surface, write_surface, write_surface_csv
+from .bench_scenario import random_positions
+from .common import EXPIRY, scaled
+
+# 2000 dates x 1001 spots at BENCH_SCALE=1, about ten million long format rows
+N_DATES, N_SPOTS = scaled(2000, 1001)
+
+
+class GenerationTime:
+    ''' Pricing a single option surface in memory and streaming it to a bundle '''
+    params = (scaled(30, 365, 1825), scaled(151, 1501))
+    param_names = ['n_dates', 'n_spots']
+    timeout = 600
+
+    def setup(self, n_dates, n_spots):
+        self.tmp = tempfile.mkdtemp()
+        self.today = EXPIRY - datetime.timedelta(days=n_dates + 1)
+        self.spots = range(200, 200 + n_spots)
+
+    def teardown(self, n_dates, n_spots):
+        shutil.rmtree(self.tmp)
+
+    def time_generate_surface(self, n_dates, n_spots):
+        generate_surface(EXPIRY, today=self.today, spots=self.spots)
+
+    def time_write_surface(self, n_dates, n_spots):
+        write_surface(os.path.join(self.tmp, 'out.surface'), EXPIRY, today=self.today, spots=self.spots)
+
+
+class Generation:
+    ''' Peak memory of writing a large single option surface to disk '''
+    number = 1
+    repeat = 1
+    timeout = 600
+
+    def setup(self):
+        self.tmp = tempfile.mkdtemp()
+        self.today = EXPIRY - datetime.timedelta(days=N_DATES + 1)
+        self.spots = range(200, 200 + N_SPOTS)
+
+    def teardown(self):
+        shutil.rmtree(self.tmp)
+
+    def peakmem_frame_to_csv(self):
+        generate_surface(EXPIRY, today=self.today, spots=self.spots).to_csv(os.path.join(self.tmp, 'out.csv'))
+
+    def peakmem_write_surface_csv(self):
+        write_surface_csv(os.path.join(self.tmp, 'out.csv'), EXPIRY, today=self.today, spots=self.spots)
+
+    def peakmem_write_surface(self):
+        write_surface(os.path.join(self.tmp, 'out.surface'), EXPIRY, today=self.today, spots=self.spots)
+
+
+def random_book(n_legs, n_underlyings=4, seed=0):
+    ''' random_positions spread over n_underlyings, each with its own spot '''
+    positions = random_positions(n_legs, seed=seed)
+    which = np.arange(n_legs) % n_underlyings
+    positions['underlying'] = ['U{}'.format(i) for i in which]
+    positions['S'] = 280.0 * (1 + which)
+    positions['K'] = positions['K'] * (1 + which)
+    return positions
+
+
+class BookGeneration:
+    ''' generate_book_surface of a multi-underlying book against pricing processes, the time
+        should fall close to 1 / workers up to the machine's core count
+    '''
+    params = (scaled(200, 800), [1, 2, 4])
+    param_names = ['n_legs', 'workers']
+    number = 1
+    repeat = 3
+    timeout = 600
+
+    def setup(self, n_legs, workers):
+        self.tmp = tempfile.mkdtemp()
+        self.positions = random_book(n_legs)
+
+    def teardown(self, n_legs, workers):
+        shutil.rmtree(self.tmp)
+
+    def time_generate_book_surface(self, n_legs, workers):
+        generate_book_surface(self.positions, os.path.join(self.tmp, 'book.surface'), workers=workers)
@@ -0,0 +1,59 @@
+import numpy as np
+from data.implied_vol import implied_vol
+from data.pricer import black_scholes_grid
+
+
+def random_book(n, seed=0):
+    ''' Prices of n random calls and puts together with the vols that produced them '''
+    rng = np.random.RandomState(seed)
+    book = {
+        'flag': rng.choice(['c', 'p'], n),
+        'S': rng.uniform(150, 400, n),
+        'K': rng.uniform(200, 350, n),
+        't': rng.uniform(5, 700, n) / 365,
+        'r': 0.05,
+    }
+    sigma = rng.uniform(0.05, 1.2, n)
+    greeks = black_scholes_grid(book['flag'], book['S'], book['K'], book['t'], book['r'], sigma)
+    # Keep prices whose vol is identifiable in double precision
+    keep = greeks['vega'] > 1e-4
+    book = {k: v[keep] if np.ndim(v) else v for k, v in book.items()}
+    book['price'] = greeks['value'][keep]
+    return book, sigma[keep]
+
+
+class ImpliedVol:
+    ''' Throughput and accuracy of the vectorised solver against py_vollib's scalar solver '''
+    params = [100, 1000, 10000]
+    param_names = ['n_rows']
+
+    def setup(self, n_rows):
+        self.book, self.sigma = random_book(n_rows)
+
+    def _solve(self):
+        b = self.book
+        return implied_vol(b['price'], b['flag'], b['S'], b['K'], b['t'], b['r'])
+
+    def time_vectorised(self, n_rows):
+        self._solve()
+
+    def _py_vollib(self):
+        from py_vollib.black_scholes.implied_volatility import implied_volatility
+        b = self.book
+        out = np.full(len(b['price']), np.nan)
+        for i in range(len(out)):
+            try:
+                out[i] = implied_volatility(b['price'][i], b['S'][i], b['K'][i], b['t'][i], b['r'], b['flag'][i])
+            except Exception:
+                # lets_be_rational rejects prices within rounding of intrinsic
+                pass
+        return out
+
+    def time_py_vollib(self, n_rows):
+        self._py_vollib()
+
+    def track_max_abs_error(self, n_rows):
+        return float(np.max(np.abs(self._solve() - self.sigma)))
+
+    def track_max_abs_diff_py_vollib(self, n_rows):
+        return float(np.nanmax(np.abs(self._solve() - self._py_vollib())))
@@ -0,0 +1,63 @@
+from datetime import datetime as dt
+import os
+import shutil
+import tempfile
+import pandas as pd
+from data.surface_store import bundle_path, load_surface, read_surface_csv
+from .common import scaled, synthetic_frame
+
+N_DATES = scaled(30, 365, 1825)
+N_SPOTS = scaled(151)[0]
+
+
+def _csv(directory, n_dates):
+    return os.path.join(directory, 'surface_{}.csv'.format(n_dates))
+
+
+class LoadSurface:
+    ''' The surface load at the top of main.py, from the long format csv and from its bundle '''
+    params = N_DATES
+    param_names = ['n_dates']
+    number = 1
+    timeout = 600
+
+    def setup_cache(self):
+        directory = tempfile.mkdtemp()
+        for n_dates in N_DATES:
+            synthetic_frame(n_dates, N_SPOTS).to_csv(_csv(directory, n_dates))
+        return directory
+
+    def setup(self, directory, n_dates):
+        self.csv_path = _csv(directory, n_dates)
+        shutil.rmtree(bundle_path(self.csv_path), ignore_errors=True)
+
+    def time_legacy_read_csv(self, directory, n_dates):
+        # What main.py did before the store
+        api_data = pd.read_csv(self.csv_path)
+        api_data = api_data[(api_data.plot_type != 'spot') & (api_data.plot_type != 't')]
+        api_data['date'] = api_data['date'].apply(lambda x: dt.strptime(x, "%Y-%m-%d").date())
+        api_data['value'] = pd.to_numeric(api_data['value'])
+
+    def time_read_surface_csv(self, directory, n_dates):
+        read_surface_csv(self.csv_path)
+
+    def time_load_surface_rebuild(self, directory, n_dates):
+        # First start after the csv changed, the bundle is rebuilt
+        load_surface(self.csv_path)
+
+
+class LoadBundle:
+    ''' Every later start, the fresh bundle is memory mapped '''
+    params = N_DATES
+    param_names = ['n_dates']
+
+    def setup_cache(self):
+        directory = tempfile.mkdtemp()
+        for n_dates in N_DATES:
+            path = _csv(directory, n_dates)
+            synthetic_frame(n_dates, N_SPOTS).to_csv(path)
+            load_surface(path)
+        return directory
+
+    def time_load_surface(self, directory, n_dates):
+        load_surface(_csv(directory, n_dates))
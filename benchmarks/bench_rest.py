@@ -0,0 +1,31 @@
+from contextlib import ExitStack
+import numpy as np
+from data import rest_client
+from data.rest_stub import stub_server
+from .bench_scenario import EVAL, random_positions
+from .common import scaled
+
+
+class RestPricing:
+    ''' Legs priced through RestPricer against the stub server on a 60 date x 151 spot grid,
+        one leg per round trip against batches with requests in flight concurrently
+    '''
+    params = (scaled(50, 200), [1, 64], [1, 4])
+    param_names = ['n_legs', 'batch_legs', 'max_in_flight']
+
+    def setup(self, n_legs, batch_legs, max_in_flight):
+        if rest_client.aiohttp is None:
+            raise NotImplementedError('needs aiohttp')
+        self.positions = random_positions(n_legs)
+        self.dates = np.arange(EVAL, EVAL + 60)
+        self.spots = np.arange(200, 351)
+        self.stack = ExitStack()
+        url = self.stack.enter_context(stub_server())
+        self.pricer = rest_client.RestPricer(url, batch_legs=batch_legs, max_in_flight=max_in_flight)
+
+    def teardown(self, n_legs, batch_legs, max_in_flight):
+        self.pricer.close()
+        self.stack.close()
+
+    def time_price(self, n_legs, batch_legs, max_in_flight):
+        self.pricer(self.positions, self.dates, self.spots)
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+from data.scenario import scenario_ladder
+from .common import scaled
+
+EVAL = 737922
+
+
+def random_positions(n, seed=0):
+    ''' Positions frame of n random legs on one underlying, all live on EVAL + 10 '''
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        'underlying': '',
+        'flag': rng.choice(['c', 'p'], n),
+        'eval': EVAL,
+        'expiry': EVAL + rng.randint(30, 700, n),
+        'K': rng.uniform(200, 350, n),
+        'S': 280.0,
+        'r': 0.01,
+        'q': 0.0,
+        'price': 10.0,
+        'sigma': rng.uniform(0.1, 0.6, n),
+    })
+
+
+class ScenarioLadder:
+    ''' P&L ladder of a book over a 200 spot x 50 vol shock grid '''
+    params = scaled(10, 100, 300)
+    param_names = ['n_legs']
+
+    def setup(self, n_legs):
+        self.positions = random_positions(n_legs)
+        self.spot_shocks = np.linspace(-0.3, 0.3, 200)
+        self.vol_shocks = np.linspace(-0.2, 0.2, 50)
+
+    def time_scenario_ladder(self, n_legs):
+        scenario_ladder(self.positions, EVAL + 10, self.spot_shocks, self.vol_shocks, rate_shock=0.01)
@@ -0,0 +1,54 @@
+import datetime
+import os
+import shutil
+import tempfile
+from sqlalchemy.orm import Session
+from data.sql import Asset, bulk_insert_surface, create_sqlite_engine, read_date_slice
+from .common import EXPIRY, scaled, synthetic_store
+
+# 1000 dates x 1001 spots at BENCH_SCALE=1, about a million Options rows
+N_DATES, N_SPOTS = scaled(1000, 1001)
+
+
+def _populated(path, store):
+    engine = create_sqlite_engine(path)
+    with Session(engine) as session:
+        session.add(Asset(id=1, asset_name="S&P 500", ticker="SPX"))
+        session.commit()
+    bulk_insert_surface(engine, 1, store, EXPIRY)
+    return engine
+
+
+class BulkInsert:
+    ''' Writing a million row surface into a fresh WAL database '''
+    number = 1
+    repeat = 3
+    timeout = 600
+
+    def setup(self):
+        self.store = synthetic_store(N_DATES, N_SPOTS)
+        self.tmp = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.tmp)
+
+    def time_bulk_insert_surface(self):
+        _populated(os.path.join(self.tmp, 'bench.db'), self.store)
+
+
+class DateSlice:
+    ''' Reading one date of a million row table through the composite index '''
+    timeout = 600
+
+    def setup_cache(self):
+        store = synthetic_store(N_DATES, N_SPOTS)
+        path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        _populated(path, store)
+        return path, store.min_date + datetime.timedelta(days=N_DATES // 2)
+
+    def setup(self, cache):
+        path, _ = cache
+        self.engine = create_sqlite_engine(path)
+
+    def time_read_date_slice(self, cache):
+        read_date_slice(self.engine, 1, cache[1])
@@ -0,0 +1,31 @@
+import datetime
+import os
+import numpy as np
+from data.risk_calculator import generate_surface
+from data.surface_store import SurfaceStore
+
+EXPIRY = datetime.date(2021, 12, 17)
+# Multiplies every synthetic grid size, e.g. BENCH_SCALE=0.1 for a quick run or 4 to stress
+SCALE = float(os.environ.get('BENCH_SCALE', '1'))
+
+
+def scaled(*sizes):
+    ''' Grid sizes multiplied by BENCH_SCALE, never below 2 '''
+    return [max(int(n * SCALE), 2) for n in sizes]
+
+
+def synthetic_frame(n_dates, n_spots):
+    ''' Long format surface of a single call with n_dates days to expiry and n_spots integer spots '''
+    spots = np.arange(200, 200 + n_spots)
+    today = EXPIRY - datetime.timedelta(days=n_dates + 1)
+    return generate_surface(EXPIRY, today=today, strike=200 + n_spots // 2, spots=spots)
+
+
+def synthetic_store(n_dates, n_spots):
+    return SurfaceStore.from_frame(synthetic_frame(n_dates, n_spots))
+
+
+def slider(store):
+    ''' Date slider value a quarter of the way in from either end of the surface '''
+    n = len(store.dates)
+    return [int(store.dates[n // 4]), int(store.dates[-1 - n // 4])]
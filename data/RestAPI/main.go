@@ -1,12 +1,15 @@
 package main
 
 import (
+	"bufio"
+	"encoding/binary"
 	"encoding/json"
 	"fmt"
 	"log"
 	"net/http"
 	"reflect"
 	"strconv"
+	"strings"
 
 	"github.com/gorilla/mux"
 	"github.com/yjthay/ib_dashboard/data/RestAPI/pricer"
@@ -14,6 +17,13 @@ import (
 
 var portfolio []pricer.VanillaOption
 
+// BatchRequest is a set of options to price on one shared (date x spot) grid
+type BatchRequest struct {
+	Dates   []string               `json:"dates"`   // YYYYMMDD
+	Spots   []float64              `json:"spots"`   // spot axis of the grid
+	Options []pricer.VanillaOption `json:"options"` // sigma must be set, -1 solves it from price
+}
+
 func main() {
 	router := mux.NewRouter()
 	portfolio = append(portfolio, pricer.VanillaOption{Strike: 280, Spot: 280, RiskFreeRate: 0.05,
@@ -25,6 +35,7 @@ func main() {
 	router.HandleFunc("/api/opts", getAllOpts).Methods("GET")
 	router.HandleFunc("/api/opts/{id}", getOpt).Methods("GET")
 	router.HandleFunc("/api/opts", createOpt).Methods("POST")
+	router.HandleFunc("/api/opts/batch", priceBatch).Methods("POST")
 	router.HandleFunc("/api/opts/{id}", deleteOpt).Methods("DELETE")
 	router.HandleFunc("/api/opts/{id}", updateOpt).Methods("PUT")
 
@@ -139,3 +150,26 @@ func updateOpt(w http.ResponseWriter, r *http.Request) {
 	json.NewDecoder(r.Body).Decode(opt)
 	json.NewEncoder(w).Encode(opt)
 }
+
+// Price a batch of options on a grid without touching the portfolio.
+// The body is every option's (date x greek x spot) block as little endian float64, in request
+// order, with the greeks named in the X-Greeks header
+func priceBatch(w http.ResponseWriter, r *http.Request) {
+	var batch BatchRequest
+	if err := json.NewDecoder(r.Body).Decode(&batch); err != nil {
+		w.WriteHeader(400)
+		w.Write([]byte("Batch could not be decoded"))
+		return
+	}
+	w.Header().Set("Content-Type", "application/octet-stream")
+	w.Header().Set("X-Greeks", strings.Join(pricer.GridGreeks, ","))
+	out := bufio.NewWriter(w)
+	for _, opt := range batch.Options {
+		if opt.Sigma == -1 {
+			opt = *pricer.Opt(opt.Type, opt.EvalDate, opt.ExpDate,
+				opt.Strike, opt.Spot, opt.RiskFreeRate, opt.Q, opt.Price, -1)
+		}
+		binary.Write(out, binary.LittleEndian, opt.Grid(batch.Dates, batch.Spots))
+	}
+	out.Flush()
+}
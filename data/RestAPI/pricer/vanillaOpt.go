@@ -133,6 +133,52 @@ func (opt *VanillaOption) init() {
 	}
 }
 
+// GridGreeks is the order of the greeks in a block returned by Grid
+var GridGreeks = []string{"delta", "gamma", "theta", "vega", "value"}
+
+// Grid prices the option on every (date, spot) pair of a grid into a (date x greek x spot) block,
+// laid out like the dashboard's surfaces: zero before EvalDate and only the intrinsic value from
+// ExpDate onwards. Theta is per calendar day and vega per 1% move in vol
+func (opt *VanillaOption) Grid(dates []string, spots []float64) []float64 {
+	n := len(spots)
+	out := make([]float64, len(dates)*len(GridGreeks)*n)
+	cp := 1.0
+	if opt.Type == "P" {
+		cp = -1.0
+	}
+	for i, date := range dates {
+		// YYYYMMDD dates order as strings
+		block := out[i*len(GridGreeks)*n : (i+1)*len(GridGreeks)*n]
+		if date >= opt.ExpDate {
+			for j, refSpot := range spots {
+				block[4*n+j] = math.Max(cp*(refSpot-opt.Strike), 0)
+			}
+			continue
+		}
+		if date < opt.EvalDate {
+			continue
+		}
+		T := calculateT(date, opt.ExpDate) / 365.0
+		sqrtT := math.Sqrt(T)
+		qDisc := math.Exp(-opt.Q * T)
+		rDisc := math.Exp(-opt.RiskFreeRate * T)
+		for j, refSpot := range spots {
+			d1 := opt.d1(opt.Sigma, T, refSpot)
+			d2 := d1 - opt.Sigma*sqrtT
+			nPrime := math.Exp(-0.5*d1*d1) / math.Sqrt(2*math.Pi)
+			cdfD1 := norm.Cdf(cp * d1)
+			cdfD2 := norm.Cdf(cp * d2)
+			block[j] = cp * qDisc * cdfD1
+			block[n+j] = qDisc * nPrime / (refSpot * opt.Sigma * sqrtT)
+			block[2*n+j] = (-refSpot*qDisc*nPrime*opt.Sigma/(2*sqrtT) -
+				cp*opt.RiskFreeRate*opt.Strike*rDisc*cdfD2 + cp*opt.Q*refSpot*qDisc*cdfD1) / 365
+			block[3*n+j] = 0.01 * refSpot * qDisc * sqrtT * nPrime
+			block[4*n+j] = cp * (refSpot*qDisc*cdfD1 - opt.Strike*rDisc*cdfD2)
+		}
+	}
+	return out
+}
+
 // func main() {
 // 	mockOption := Opt("P", "20200510", "20210510", 280, 280, 0.05, 0, 26.191744957864472, -1)
 // 	// fmt.Printf("Price: %g\nDelta: %g\nGamma: %g\nTheta: %g\nVega: %g",
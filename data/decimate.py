@@ -0,0 +1,29 @@
+import numpy as np
+
+
+def minmax_indices(y, n_buckets):
+    ''' Indices that keep the first and last point plus the min and max of y in each of
+        n_buckets equal width buckets, sorted. Series that already fit are returned whole.
+    '''
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= 2 * n_buckets + 2:
+        return np.arange(n)
+    width = -(-n // n_buckets)
+    n_buckets = -(-n // width)
+    pad = n_buckets * width - n
+    low = np.concatenate([np.where(np.isnan(y), np.inf, y), np.full(pad, np.inf)])
+    high = np.concatenate([np.where(np.isnan(y), -np.inf, y), np.full(pad, -np.inf)])
+    offsets = np.arange(n_buckets) * width
+    picks = np.concatenate([[0, n - 1],
+                            offsets + low.reshape(n_buckets, width).argmin(axis=1),
+                            offsets + high.reshape(n_buckets, width).argmax(axis=1)])
+    return np.unique(np.minimum(picks, n - 1))
+
+
+def decimate(x, y, max_points):
+    ''' Min/max bucketed (x, y) with at most max_points + 2 points, keeping every extreme that
+        would be visible at one point per pixel
+    '''
+    idx = minmax_indices(y, max(max_points // 2, 1))
+    return np.asarray(x)[idx], np.asarray(y)[idx]
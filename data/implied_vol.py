@@ -0,0 +1,56 @@
+import numpy as np
+from data.pricer import is_call, value_and_vega
+
+MIN_VOL = 1e-6
+MAX_VOL = 5.0
+
+
+def initial_guess(price, flag, S, K, t, r, q=0.0):
+    ''' Corrado-Miller estimate of the vol, puts are mapped to calls through put-call parity '''
+    s_fwd = S * np.exp(-q * t)
+    k_disc = K * np.exp(-r * t)
+    call = np.where(is_call(flag), price, price + s_fwd - k_disc)
+    half_moneyness = call - (s_fwd - k_disc) / 2
+    root = np.sqrt(np.maximum(half_moneyness ** 2 - (s_fwd - k_disc) ** 2 / np.pi, 0.0))
+    guess = np.sqrt(2 * np.pi / t) * (half_moneyness + root) / (s_fwd + k_disc)
+    return np.where(np.isfinite(guess) & (guess > MIN_VOL), np.minimum(guess, MAX_VOL), 0.3)
+
+
+def implied_vol(price, flag, S, K, t, r, q=0.0, tol=1e-10, max_iter=100):
+    ''' Black-Scholes-Merton implied vol for every element of the broadcast inputs at once.
+        Vectorised Newton-Raphson from the Corrado-Miller guess. Each element keeps a
+        [MIN_VOL, MAX_VOL] bracket and takes a bisection step whenever Newton would leave it.
+        Prices outside the no-arbitrage bounds, or that do not converge, give NaN.
+    '''
+    arrays = np.broadcast_arrays(is_call(flag), *(np.asarray(x, dtype=np.float64)
+                                                  for x in (price, S, K, t, r, q)))
+    shape = arrays[0].shape
+    call, price, S, K, t, r, q = (a.ravel() for a in arrays)
+    s_fwd = S * np.exp(-q * t)
+    k_disc = K * np.exp(-r * t)
+    lower = np.where(call, np.maximum(s_fwd - k_disc, 0.0), np.maximum(k_disc - s_fwd, 0.0))
+    upper = np.where(call, s_fwd, k_disc)
+    valid = (price > lower) & (price < upper) & (t > 0)
+
+    sigma = np.full(price.shape, np.nan)
+    sigma[valid] = initial_guess(price[valid], call[valid], S[valid], K[valid], t[valid], r[valid], q[valid])
+    lo = np.full(price.shape, MIN_VOL)
+    hi = np.full(price.shape, MAX_VOL)
+    todo = np.nonzero(valid)[0]
+    for _ in range(max_iter):
+        if not len(todo):
+            break
+        sig = sigma[todo]
+        value, vega = value_and_vega(call[todo], S[todo], K[todo], t[todo], r[todo], sig, q[todo])
+        diff = value - price[todo]
+        converged = np.abs(diff) <= tol
+        hi[todo] = np.where(diff > 0, sig, hi[todo])
+        lo[todo] = np.where(diff < 0, sig, lo[todo])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = sig - diff / vega
+        bisect = ~np.isfinite(step) | (step < lo[todo]) | (step > hi[todo])
+        step = np.where(bisect, 0.5 * (lo[todo] + hi[todo]), step)
+        sigma[todo] = np.where(converged, sig, step)
+        todo = todo[~converged & (hi[todo] - lo[todo] > tol)]
+    sigma[todo] = np.nan
+    return sigma.reshape(shape)
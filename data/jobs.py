@@ -0,0 +1,149 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import threading
+import uuid
+from data.portfolio import PortfolioSurface, portfolio_grid, price_positions
+
+# Positions priced per pool task, progress is reported in steps of one chunk
+CHUNK_SIZE = 16
+
+
+class Job:
+    ''' A portfolio surface being priced as a set of chunk futures '''
+
+    def __init__(self, job_id, positions, portfolio, futures):
+        self.job_id = job_id
+        self.positions = positions
+        self.portfolio = portfolio
+        self.futures = futures
+        self.priced = {}
+        self.surface = None
+        self.error = None
+
+    @property
+    def progress(self):
+        if not self.futures:
+            return 1.0
+        return sum(f.done() for f in self.futures) / len(self.futures)
+
+    @property
+    def state(self):
+        if self.error is not None:
+            return 'failed'
+        if self.surface is not None:
+            return 'done'
+        return 'running'
+
+
+class JobQueue:
+    ''' Background portfolio pricing on a process pool.
+        submit returns a job id straight away, the surface is assembled from the chunk results
+        on the pool's callback thread so request threads never wait on pricing. The queue keeps a
+        PortfolioSurface across jobs, so only positions that changed since the last job are sent
+        to the pool when the new book has the same grid. Any other book gets a fresh surface on
+        its own portfolio_grid, so a surface never depends on what the worker priced before.
+        Jobs of different users may finish in any order, each surface is the sum over its own book.
+        on_done, if given, is called with every job that finishes or fails, e.g. to publish its
+        surface to other processes. pricer, e.g. a data.rest_client.RestPricer, offloads pricing
+        to the Go service: it then gets every missing leg of a job in one call on a thread pool,
+        as it batches and overlaps requests itself, instead of chunks on the process pool.
+    '''
+
+    def __init__(self, max_workers=1, on_done=None, pricer=None):
+        self.max_workers = max_workers
+        self.on_done = on_done
+        self.remote = pricer is not None
+        self.pricer = pricer or price_positions
+        self.portfolio = None
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Created on first use so every gunicorn worker forks its own pool after start up
+        if self._executor is None:
+            pool = ThreadPoolExecutor if self.remote else ProcessPoolExecutor
+            self._executor = pool(max_workers=self.max_workers)
+        return self._executor
+
+    def _submit_chunks(self, todo, portfolio):
+        size = len(todo) if self.remote else CHUNK_SIZE
+        chunks = [todo.iloc[i:i + size] for i in range(0, len(todo), size)]
+        try:
+            return [self._pool().submit(self.pricer, chunk, portfolio.dates, portfolio.spots)
+                    for chunk in chunks]
+        except BrokenProcessPool:
+            # A pool process died, e.g. killed out of memory, and the executor never recovers.
+            # Jobs already on it fail, this one and later ones go to a new pool.
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            return [self._pool().submit(self.pricer, chunk, portfolio.dates, portfolio.spots)
+                    for chunk in chunks]
+
+    def _watch(self, job):
+        for f in job.futures:
+            f.add_done_callback(lambda _, job=job: self._collect(job))
+        if not job.futures:
+            self._collect(job)
+
+    def submit(self, positions):
+        ''' Queue a positions frame (see data.portfolio.parse_positions) and return its job id '''
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            portfolio = self.portfolio
+            if portfolio is None or not portfolio.on_grid(positions):
+                portfolio = PortfolioSurface(*portfolio_grid(positions))
+            futures = self._submit_chunks(portfolio.missing(positions), portfolio)
+            job = Job(job_id, positions, portfolio, futures)
+            self._jobs[job_id] = job
+        self._watch(job)
+        return job_id
+
+    def _collect(self, job):
+        with self._lock:
+            if job.surface is not None or job.error is not None:
+                return
+            if not all(f.done() for f in job.futures):
+                return
+            self._finish(job)
+        if job.state == 'running':
+            self._watch(job)
+        elif self.on_done is not None:
+            self.on_done(job)
+
+    def _finish(self, job):
+        # Runs under the lock, so it never prices: legs still missing go back to the pool
+        try:
+            for f in job.futures:
+                job.priced.update(f.result())
+            current = self.portfolio
+            if current is not None and job.portfolio is not current and current.on_grid(job.positions):
+                # Another job on the same grid finished while this one ran, reuse the legs cached there
+                job.portfolio, job.priced = current, {}
+            job.portfolio.contributions.update(job.priced)
+            todo = job.portfolio.missing(job.positions)
+            if len(todo):
+                # Legs priced on another grid, or dropped from the cache by a later update
+                job.futures = self._submit_chunks(todo, job.portfolio)
+                return
+            job.surface = job.portfolio.update(job.positions)
+        except BrokenProcessPool:
+            job.error = 'pricing process died, e.g. out of memory'
+            return
+        except Exception as e:
+            job.error = repr(e)
+            return
+        self.portfolio = job.portfolio
+
+    def status(self, job_id):
+        ''' Dict with the job's state ('unknown', 'running', 'done' or 'failed') and progress '''
+        job = self._jobs.get(job_id)
+        if job is None:
+            return {'job_id': job_id, 'state': 'unknown', 'progress': 0.0}
+        return {'job_id': job_id, 'state': job.state, 'progress': job.progress, 'error': job.error}
+
+    def pop(self, job_id):
+        ''' Remove a finished job and return its surface '''
+        with self._lock:
+            job = self._jobs.pop(job_id)
+        return job.surface
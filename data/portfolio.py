@@ -0,0 +1,165 @@
+from collections import Counter
+import hashlib
+from datetime import datetime as dt
+import numpy as np
+import pandas as pd
+from data.pricer import GREEKS, DAYS_PER_YEAR, black_scholes_grid
+from data.implied_vol import implied_vol
+from data.surface_store import SurfaceStore
+
+MULTIPLIER = 1000
+# Used for positions whose price has no implied vol (outside the no-arbitrage bounds)
+DEFAULT_VOL = 0.3
+# Spot axis of a portfolio surface spans this fraction either side of the position spots
+SPOT_RANGE = 0.25
+INPUT_COLUMNS = ['type', 'evalDate', 'expDate', 'K', 'S', 'r', 'Q', 'price']
+POSITION_COLUMNS = ['underlying', 'flag', 'eval', 'expiry', 'K', 'S', 'r', 'q', 'price']
+
+
+FLAGS = {'c': 'c', 'call': 'c', 'p': 'p', 'put': 'p'}
+
+
+def _ordinal(row, column):
+    try:
+        return dt.strptime(str(row[column]).strip(), '%Y%m%d').toordinal()
+    except ValueError:
+        raise ValueError('{} must be YYYYMMDD, got {!r}'.format(column, row[column]))
+
+
+def _number(row, column, positive=False):
+    try:
+        value = float(row[column])
+    except (TypeError, ValueError):
+        raise ValueError('{} must be a number, got {!r}'.format(column, row[column]))
+    if not np.isfinite(value) or (positive and value <= 0):
+        raise ValueError('{} must be a {}number, got {!r}'.format(column, 'positive ' if positive else '', row[column]))
+    return value
+
+
+def parse_row(row):
+    ''' Position record of one input_table row, raising ValueError with what is wrong with it '''
+    missing = [c for c in INPUT_COLUMNS if row.get(c) in (None, '')]
+    if missing:
+        raise ValueError('missing {}'.format(', '.join(missing)))
+    flag = FLAGS.get(str(row['type']).strip().lower())
+    if flag is None:
+        raise ValueError('type must be Call or Put, got {!r}'.format(row['type']))
+    eval_date, expiry = _ordinal(row, 'evalDate'), _ordinal(row, 'expDate')
+    if expiry <= eval_date:
+        raise ValueError('expDate must be after evalDate')
+    return {
+        'underlying': str(row.get('underlying') or ''),
+        'flag': flag,
+        'eval': eval_date,
+        'expiry': expiry,
+        'K': _number(row, 'K', positive=True),
+        'S': _number(row, 'S', positive=True),
+        'r': _number(row, 'r') / 100,
+        'q': _number(row, 'Q') / 100,
+        'price': _number(row, 'price', positive=True),
+    }
+
+
+def parse_positions(rows, errors=None):
+    ''' Positions frame from input_table rows, with the implied vol of every position's price.
+        Rows that cannot be priced are skipped, see parse_row. If errors is a list, a
+        'row n: reason' message is appended for each of them that is not blank (e.g. the rows
+        added by 'Add Row'). r and Q are entered in percent, dates as YYYYMMDD. An optional
+        'underlying' column is carried through for multi-underlying books.
+    '''
+    records = []
+    for n, row in enumerate(rows or [], 1):
+        try:
+            records.append(parse_row(row))
+        except ValueError as e:
+            if errors is not None and any(row.get(c) not in (None, '') for c in INPUT_COLUMNS):
+                errors.append('row {}: {}'.format(n, e))
+    positions = pd.DataFrame(records, columns=POSITION_COLUMNS)
+    sigma = implied_vol(positions['price'].values, positions['flag'].values, positions['S'].values,
+                        positions['K'].values, (positions['expiry'] - positions['eval']).values / DAYS_PER_YEAR,
+                        positions['r'].values, positions['q'].values)
+    positions['sigma'] = np.where(np.isnan(sigma), DEFAULT_VOL, sigma)
+    return positions
+
+
+def portfolio_grid(positions):
+    ''' Ordinal dates from the first evaluation date up to the last expiry and an integer spot axis '''
+    dates = np.arange(positions['eval'].min(), positions['expiry'].max())
+    spots = np.arange(int(np.floor(positions['S'].min() * (1 - SPOT_RANGE))),
+                      int(np.ceil(positions['S'].max() * (1 + SPOT_RANGE))) + 1)
+    return dates, spots
+
+
+def price_position(position, dates, spots, multiplier=MULTIPLIER):
+    ''' (date x greek x spot) contribution of a single position at its own implied vol.
+        The position contributes nothing before its evaluation date and only its intrinsic
+        value from expiry onwards.
+    '''
+    out = np.zeros((len(dates), len(GREEKS), len(spots)))
+    live = (dates >= position['eval']) & (dates < position['expiry'])
+    if live.any():
+        t = (position['expiry'] - dates[live])[:, np.newaxis] / DAYS_PER_YEAR
+        greeks = black_scholes_grid(position['flag'], spots[np.newaxis, :], position['K'], t,
+                                    position['r'], position['sigma'], position['q'])
+        out[live] = np.stack([greeks[g] for g in GREEKS], axis=1)
+    expired = dates >= position['expiry']
+    if expired.any():
+        phi = 1.0 if position['flag'] == 'c' else -1.0
+        out[expired, GREEKS.index('value')] = np.maximum(phi * (spots - position['K']), 0.0)
+    return out * multiplier
+
+
+def position_keys(positions):
+    ''' 64 bit content hash of every position, equal rows share a key '''
+    return pd.util.hash_pandas_object(positions[POSITION_COLUMNS], index=False).values
+
+
+def portfolio_key(positions):
+    ''' Hex digest of a whole book, independent of row order, shared by every process '''
+    return hashlib.sha1(np.sort(position_keys(positions)).tobytes()).hexdigest()
+
+
+def price_positions(positions, dates, spots, multiplier=MULTIPLIER):
+    ''' Contribution of every position, keyed by position_keys '''
+    return {key: price_position(p, dates, spots, multiplier)
+            for key, (_, p) in zip(position_keys(positions), positions.iterrows())}
+
+
+class PortfolioSurface:
+    ''' Portfolio surface kept as the sum of per-position contributions.
+        Contributions are cached by position_keys, so adding, deleting or editing a row only prices
+        the legs whose content changed and moves the aggregate by one add or subtract per leg.
+    '''
+
+    def __init__(self, dates, spots):
+        self.dates = dates
+        self.spots = spots
+        self.values = np.zeros((len(dates), len(GREEKS), len(spots)))
+        self.contributions = {}
+        self.counts = Counter()
+
+    def on_grid(self, positions):
+        ''' True if positions' own portfolio_grid is exactly this surface's date and spot grid '''
+        dates, spots = portfolio_grid(positions)
+        return np.array_equal(dates, self.dates) and np.array_equal(spots, self.spots)
+
+    def missing(self, positions):
+        ''' Rows of positions whose contribution is not cached yet, one per distinct key '''
+        keys = pd.Series(position_keys(positions))
+        return positions[~keys.isin(list(self.contributions)).values & ~keys.duplicated().values]
+
+    def update(self, positions, priced=None):
+        ''' Make the aggregate the sum over positions and return it as a SurfaceStore.
+            priced holds contributions already computed elsewhere (e.g. by a job's worker pool),
+            anything else that is missing is priced here.
+        '''
+        self.contributions.update(priced or {})
+        self.contributions.update(price_positions(self.missing(positions), self.dates, self.spots))
+        counts = Counter(position_keys(positions).tolist())
+        for key in set(self.counts) | set(counts):
+            change = counts[key] - self.counts[key]
+            if change:
+                self.values += change * self.contributions[key]
+        self.counts = counts
+        self.contributions = {k: v for k, v in self.contributions.items() if k in counts}
+        return SurfaceStore(self.values.copy(), self.dates, GREEKS, self.spots)
@@ -0,0 +1,71 @@
+import numpy as np
+from scipy.special import ndtr
+
+GREEKS = ('delta', 'gamma', 'theta', 'vega', 'value')
+DAYS_PER_YEAR = 365.0
+
+
+def _norm_pdf(x):
+    ''' Standard normal density '''
+    return np.exp(-0.5 * x * x) / np.sqrt(2 * np.pi)
+
+
+def is_call(flag):
+    ''' Boolean mask of call options for a flag or an array of flags ('c'/'p', 'Call'/'Put') '''
+    flag = np.asarray(flag)
+    if flag.dtype.kind == 'b':
+        return flag
+    return np.char.lower(flag.astype(str)).astype('<U1') == 'c'
+
+
+def black_scholes_grid(flag, S, K, t, r, sigma, q=0.0):
+    ''' Black-Scholes-Merton value and greeks over a broadcast grid.
+        Every argument may be a scalar or an array, they are broadcast against each other so
+        a (spot, t, strike, vol) grid is priced in one pass. d1, d2, N(d1) and n(d1) are shared
+        by all greeks. Conventions follow py_vollib: t in years, theta per calendar day and
+        vega per 1% move in vol. Returns a dict keyed by GREEKS.
+    '''
+    S, K, t, r, sigma, q = (np.asarray(x, dtype=np.float64) for x in (S, K, t, r, sigma, q))
+    phi = np.where(is_call(flag), 1.0, -1.0)
+
+    sqrt_t = np.sqrt(t)
+    vol_t = sigma * sqrt_t
+    d1 = (np.log(S / K) + (r - q + 0.5 * sigma * sigma) * t) / vol_t
+    d2 = d1 - vol_t
+
+    q_disc = np.exp(-q * t)
+    r_disc = np.exp(-r * t)
+    s_fwd = S * q_disc
+    k_disc = K * r_disc
+    nd1 = _norm_pdf(d1)
+    cdf_d1 = ndtr(phi * d1)
+    cdf_d2 = ndtr(phi * d2)
+
+    value = phi * (s_fwd * cdf_d1 - k_disc * cdf_d2)
+    delta = phi * q_disc * cdf_d1
+    gamma = q_disc * nd1 / (S * vol_t)
+    theta = (-s_fwd * nd1 * sigma / (2 * sqrt_t)
+             - phi * r * k_disc * cdf_d2
+             + phi * q * s_fwd * cdf_d1) / DAYS_PER_YEAR
+    vega = 0.01 * s_fwd * nd1 * sqrt_t
+    return {'delta': delta, 'gamma': gamma, 'theta': theta, 'vega': vega, 'value': value}
+
+
+def value_and_vega(flag, S, K, t, r, sigma, q=0.0):
+    ''' Black-Scholes-Merton value and raw vega (per unit of vol), the pair a vol solver needs '''
+    phi = np.where(is_call(flag), 1.0, -1.0)
+    sqrt_t = np.sqrt(t)
+    d1 = (np.log(S / K) + (r - q + 0.5 * sigma * sigma) * t) / (sigma * sqrt_t)
+    s_fwd = S * np.exp(-q * t)
+    value = phi * (s_fwd * ndtr(phi * d1) - K * np.exp(-r * t) * ndtr(phi * (d1 - sigma * sqrt_t)))
+    return value, s_fwd * _norm_pdf(d1) * sqrt_t
+
+
+def price_surface(flag, spots, days, K, r, sigma, q=0.0, multiplier=1):
+    ''' Greeks of a single leg on a days-to-expiry x spot grid.
+        Returns a dict of 2-D arrays of shape (len(days), len(spots)).
+    '''
+    spots = np.asarray(spots, dtype=np.float64)[np.newaxis, :]
+    t = np.asarray(days, dtype=np.float64)[:, np.newaxis] / DAYS_PER_YEAR
+    greeks = black_scholes_grid(flag, spots, K, t, r, sigma, q)
+    return {k: v * multiplier for k, v in greeks.items()}
@@ -0,0 +1,155 @@
+import asyncio
+from datetime import date
+import os
+import threading
+import numpy as np
+from data.pricer import GREEKS, is_call
+from data.portfolio import MULTIPLIER, position_keys
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Address of the Go pricer in data/RestAPI, PRICER_URL overrides it
+PRICER_URL = 'http://localhost:7777'
+BATCH_ROUTE = '/api/opts/batch'
+# Legs per request, fewer if their grids would make a response larger than BATCH_BYTES
+BATCH_LEGS = 64
+BATCH_BYTES = 32 * 2 ** 20
+# Requests in flight at once, also the size of the connection pool
+MAX_IN_FLIGHT = 4
+RETRIES = 2
+BACKOFF = 0.1
+
+
+def _yyyymmdd(ordinal):
+    return date.fromordinal(int(ordinal)).strftime('%Y%m%d')
+
+
+def batch_body(positions, dates, spots):
+    ''' /api/opts/batch request for a positions frame (see data.portfolio.parse_positions) on a
+        (date x spot) grid. Every leg is sent with its implied vol so the service never solves it.
+    '''
+    options = [{'type': 'C' if is_call(flag) else 'P', 'strike': float(k), 'spot': float(s),
+                'sigma': float(sigma), 'evalDate': _yyyymmdd(eval_date), 'expDate': _yyyymmdd(expiry),
+                'riskFreeRate': float(r), 'divYield': float(q), 'price': float(price)}
+               for flag, k, s, sigma, eval_date, expiry, r, q, price in zip(
+                   positions['flag'], positions['K'], positions['S'], positions['sigma'], positions['eval'],
+                   positions['expiry'], positions['r'], positions['q'], positions['price'])]
+    return {'dates': [_yyyymmdd(d) for d in dates], 'spots': [float(s) for s in spots], 'options': options}
+
+
+class RestPricer:
+    ''' Prices positions on the Go REST pricer, or any server speaking its /api/opts/batch
+        protocol such as data.rest_stub.
+        Legs are sent in batches and at most max_in_flight requests run at once over a pooled
+        keep-alive connector. Batches are handed to a fixed set of max_in_flight workers, so at
+        most that many responses are held before they are decoded. Calling the pricer has the
+        signature of data.portfolio.price_positions, so it can stand in for it in data.jobs.JobQueue.
+        Calls from any thread share one event loop thread and one ClientSession, started on first
+        use in each process, so connections are kept alive between calls; close stops both.
+        Requests that fail to connect, time out or get a 5xx are retried with backoff.
+    '''
+
+    def __init__(self, url=None, batch_legs=BATCH_LEGS, max_in_flight=MAX_IN_FLIGHT, timeout=60.0,
+                 retries=RETRIES):
+        if aiohttp is None:
+            raise ImportError('the REST pricer needs the aiohttp package')
+        self.url = (url or os.environ.get('PRICER_URL', PRICER_URL)).rstrip('/')
+        self.batch_legs = batch_legs
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.retries = retries
+        self._pid = None
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._lock = threading.Lock()
+
+    def legs_per_batch(self, dates, spots):
+        ''' batch_legs, or fewer so that a response stays within BATCH_BYTES '''
+        leg_bytes = len(dates) * len(GREEKS) * len(spots) * 8
+        return max(min(self.batch_legs, BATCH_BYTES // max(leg_bytes, 1)), 1)
+
+    async def _post(self, session, body):
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(BACKOFF * 2 ** (attempt - 1))
+            try:
+                async with session.post(self.url + BATCH_ROUTE, json=body) as response:
+                    if response.status >= 500:
+                        error = 'HTTP {}'.format(response.status)
+                        continue
+                    if response.status != 200:
+                        raise RuntimeError('pricer rejected the batch: HTTP {} {}'.format(
+                            response.status, await response.text()))
+                    if response.headers.get('X-Greeks') != ','.join(GREEKS):
+                        raise RuntimeError('pricer returned greeks {}, expected {}'.format(
+                            response.headers.get('X-Greeks'), ','.join(GREEKS)))
+                    return await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = repr(e)
+        raise RuntimeError('pricer failed after {} attempts: {}'.format(self.retries + 1, error))
+
+    def _session_for_loop(self):
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight)
+        return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def price_async(self, positions, dates, spots, multiplier=MULTIPLIER, session=None):
+        ''' Contribution of every position keyed by position_keys, see price_positions. Requests go
+            through session if given, else through a session opened for this call.
+        '''
+        shape = (len(dates), len(GREEKS), len(spots))
+        size = self.legs_per_batch(dates, spots)
+        starts = iter(range(0, len(positions), size))
+        blocks = {}
+
+        async def worker(session):
+            # Workers share one iterator, so a new batch is only built once a response is in
+            for start in starts:
+                chunk = positions.iloc[start:start + size]
+                raw = await self._post(session, batch_body(chunk, dates, spots))
+                if len(raw) != len(chunk) * np.prod(shape) * 8:
+                    raise RuntimeError('pricer returned {} bytes for {} legs on a {} grid'.format(
+                        len(raw), len(chunk), shape))
+                values = np.frombuffer(raw, dtype='<f8').reshape((len(chunk),) + shape) * multiplier
+                blocks.update(zip(position_keys(chunk), values))
+
+        if session is None:
+            async with self._session_for_loop() as session:
+                await asyncio.gather(*(worker(session) for _ in range(self.max_in_flight)))
+        else:
+            await asyncio.gather(*(worker(session) for _ in range(self.max_in_flight)))
+        return blocks
+
+    def _start(self):
+        # A forked child inherits the loop object but not its thread, so it starts its own
+        with self._lock:
+            if self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, daemon=True)
+                thread.start()
+
+                async def open_session():
+                    return self._session_for_loop()
+                self._session = asyncio.run_coroutine_threadsafe(open_session(), loop).result()
+                self._pid, self._loop, self._thread = os.getpid(), loop, thread
+            return self._loop, self._session
+
+    def __call__(self, positions, dates, spots, multiplier=MULTIPLIER):
+        loop, session = self._start()
+        return asyncio.run_coroutine_threadsafe(
+            self.price_async(positions, dates, spots, multiplier, session=session), loop).result()
+
+    def close(self):
+        ''' Close the shared session and stop its event loop thread '''
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._pid = self._loop = self._thread = self._session = None
@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+from datetime import datetime as dt
+import argparse
+import asyncio
+import threading
+import numpy as np
+from data.pricer import GREEKS
+from data.portfolio import price_position
+from data.rest_client import BATCH_ROUTE
+
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
+
+def _ordinal(yyyymmdd):
+    return dt.strptime(yyyymmdd, '%Y%m%d').toordinal()
+
+
+def price_batch(body):
+    ''' Response bytes of /api/opts/batch for a decoded request, priced with data.portfolio '''
+    dates = np.array([_ordinal(d) for d in body['dates']])
+    spots = np.asarray(body['spots'], dtype=np.float64)
+    blocks = [price_position({'flag': opt['type'].lower(), 'K': opt['strike'], 'S': opt['spot'],
+                              'sigma': opt['sigma'], 'r': opt['riskFreeRate'], 'q': opt['divYield'],
+                              'eval': _ordinal(opt['evalDate']), 'expiry': _ordinal(opt['expDate'])},
+                             dates, spots, multiplier=1)
+              for opt in body['options']]
+    return np.ascontiguousarray(blocks, dtype='<f8').tobytes()
+
+
+def stub_app():
+    ''' aiohttp app standing in for the Go pricer's /api/opts/batch in tests and benchmarks.
+        Batches are priced on the default executor so concurrent requests overlap.
+    '''
+    if web is None:
+        raise ImportError('the stub pricer needs the aiohttp package')
+
+    async def batch(request):
+        body = await request.json()
+        raw = await asyncio.get_event_loop().run_in_executor(None, price_batch, body)
+        return web.Response(body=raw, content_type='application/octet-stream',
+                            headers={'X-Greeks': ','.join(GREEKS)})
+
+    app = web.Application(client_max_size=64 * 2 ** 20)
+    app.router.add_post(BATCH_ROUTE, batch)
+    return app
+
+
+@contextmanager
+def stub_server(host='127.0.0.1', port=0):
+    ''' Run stub_app on a background thread for the duration of the block and yield its url.
+        port 0 picks a free port.
+    '''
+    app = stub_app()
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, host, port)
+    loop.run_until_complete(site.start())
+    url = 'http://{}:{}'.format(*runner.addresses[0][:2])
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield url
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.run_until_complete(runner.cleanup())
+        loop.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the stand-in for the Go pricer batch endpoint')
+    parser.add_argument('--port', type=int, default=7777)
+    args = parser.parse_args()
+    web.run_app(stub_app(), port=args.port)
@@ -0,0 +1,73 @@
+from collections import OrderedDict
+import sys
+import threading
+import numpy as np
+from data.surface_store import SurfaceStore
+
+
+def approx_nbytes(obj):
+    ''' Rough deep size of a callback result made of dicts, lists and numpy arrays, or of a
+        SurfaceStore
+    '''
+    if isinstance(obj, (np.ndarray, SurfaceStore)):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(approx_nbytes(k) + approx_nbytes(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(approx_nbytes(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
+class ResultCache:
+    ''' Bounded LRU cache of callback results.
+        Entries are evicted least recently used first once either max_entries or max_bytes is
+        exceeded. Keys should include the token or key of the surface they were computed from,
+        so a regenerated surface never hits the results of the one it replaced.
+    '''
+
+    def __init__(self, max_entries=256, max_bytes=64 * 2 ** 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, compute):
+        ''' Cached result for key, calling compute() and storing its result on a miss. None is
+            returned but never stored, it stands for something not available yet.
+        '''
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+        value = compute()
+        if value is not None:
+            self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        size = approx_nbytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                self.nbytes -= self._entries.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'entries': len(self._entries), 'bytes': self.nbytes, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
@@ -1,23 +1,164 @@
-from py_vollib.black_scholes.greeks.analytical import *
-from py_vollib.black_scholes import black_scholes
+from functools import partial
+import argparse
 import datetime
+import multiprocessing
+import os
+import numpy as np
 import pandas as pd
+from data.pricer import GREEKS, price_surface
+from data.portfolio import SPOT_RANGE, parse_positions, price_position
+from data.surface_store import BundleWriter
 
-tday = datetime.date.today()
-expiry = datetime.date(2020, 9, 18)
-output = []
-multiplier = 1000
-for t in range(1, (expiry - tday).days):
-    for S in range(200, 351):
-        delta_calc = delta("c", S, 280, t / 365, 0.05, 0.3) * multiplier
-        gamma_calc = gamma("c", S, 280, t / 365, 0.05, 0.3) * multiplier
-        theta_calc = theta("c", S, 280, t / 365, 0.05, 0.3) * multiplier
-        vega_calc = vega("c", S, 280, t / 365, 0.05, 0.3) * multiplier
-        value = black_scholes("c", S, 280, t / 365, 0.05, 0.3) * multiplier
-        output.append((delta_calc, gamma_calc, theta_calc, vega_calc,value, expiry - datetime.timedelta(days=t), S))
-
-output = pd.DataFrame(output, columns=['delta', 'gamma', 'theta', 'vega','value', 't', 'spot'])
-output.index = [output['t'], output['spot']]
-output = output.stack().reset_index()
-output.columns = ['date','spot','plot_type', 'value']
-output.to_csv("spx_test.csv")
+# Legs per pool task, within one (underlying, expiry) group
+BOOK_CHUNK = 32
+# Dates summed at a time when reducing the per-worker buffers into the output
+REDUCE_BLOCK = 256
+# Dates priced and written per chunk by the streaming writers
+CHUNK_DAYS = 32
+
+_worker = {}
+
+
+def generate_surface(expiry, today=None, flag='c', strike=280, spots=range(200, 351),
+                     r=0.05, sigma=0.3, multiplier=1000):
+    ''' Long format (date, spot, plot_type, value) surface of a single option.
+        Every greek is evaluated over the whole days-to-expiry x spot grid in one vectorised pass.
+    '''
+    today = today or datetime.date.today()
+    days = np.arange(1, (expiry - today).days)
+    spots = np.asarray(spots)
+    greeks = price_surface(flag, spots, days, strike, r, sigma, multiplier=multiplier)
+
+    dates = np.array([expiry - datetime.timedelta(days=int(t)) for t in days])
+    n_dates, n_spots, n_greeks = len(days), len(spots), len(GREEKS)
+    values = np.stack([greeks[g] for g in GREEKS], axis=-1)
+    return pd.DataFrame({
+        'date': np.repeat(dates, n_spots * n_greeks),
+        'spot': np.tile(np.repeat(spots, n_greeks), n_dates),
+        'plot_type': np.tile(GREEKS, n_dates * n_spots),
+        'value': values.ravel(),
+    })
+
+
+def surface_chunks(expiry, today=None, flag='c', strike=280, spots=range(200, 351),
+                   r=0.05, sigma=0.3, multiplier=1000, chunk_days=CHUNK_DAYS):
+    ''' Ordinal dates of the single option surface in ascending order, and a generator of
+        (start, block) pieces of at most chunk_days dates with block as (date x greek x spot)
+    '''
+    today = today or datetime.date.today()
+    days = np.arange((expiry - today).days - 1, 0, -1)
+    spots = np.asarray(spots)
+
+    def blocks():
+        for start in range(0, len(days), chunk_days):
+            greeks = price_surface(flag, spots, days[start:start + chunk_days], strike, r, sigma,
+                                   multiplier=multiplier)
+            yield start, np.stack([greeks[g] for g in GREEKS], axis=1)
+    return expiry.toordinal() - days, blocks()
+
+
+def write_surface(path, expiry, spots=range(200, 351), **kwargs):
+    ''' Stream the single option surface into a bundle at path, chunk_days dates at a time,
+        so memory stays bounded by one chunk whatever the grid size
+    '''
+    dates, blocks = surface_chunks(expiry, spots=spots, **kwargs)
+    with BundleWriter(path, dates, GREEKS, spots) as bundle:
+        for start, block in blocks:
+            bundle.write(start, block)
+
+
+def write_surface_csv(path, expiry, spots=range(200, 351), **kwargs):
+    ''' Stream the single option surface into a long format (date, spot, plot_type, value) csv,
+        appending one chunk of dates at a time
+    '''
+    dates, blocks = surface_chunks(expiry, spots=spots, **kwargs)
+    spots = np.asarray(spots)
+    with open(path, 'w') as f:
+        for start, block in blocks:
+            n_dates, n_greeks, n_spots = block.shape
+            chunk_dates = [datetime.date.fromordinal(int(d)) for d in dates[start:start + n_dates]]
+            pd.DataFrame({
+                'date': np.repeat(chunk_dates, n_greeks * n_spots),
+                'spot': np.tile(spots, n_dates * n_greeks),
+                'plot_type': np.tile(np.repeat(GREEKS, n_spots), n_dates),
+                'value': block.ravel(),
+            }).to_csv(f, header=start == 0, index=False)
+
+
+def book_grid(positions):
+    ''' Ordinal dates spanning the book and a spot axis of whole percent moves.
+        Legs on different underlyings are summed along the same move from their own spot.
+    '''
+    dates = np.arange(positions['eval'].min(), positions['expiry'].max())
+    moves = np.arange(-int(SPOT_RANGE * 100), int(SPOT_RANGE * 100) + 1)
+    return dates, moves
+
+
+def book_chunks(positions, chunk_size=BOOK_CHUNK):
+    ''' Positions split by underlying and expiry, large groups in pieces of chunk_size legs '''
+    for _, group in positions.groupby(['underlying', 'expiry'], sort=False):
+        for i in range(0, len(group), chunk_size):
+            yield group.iloc[i:i + chunk_size]
+
+
+def _init_worker(slots, buffers_path):
+    # Every pool process owns one slab of the shared buffers for the whole run
+    _worker['slot'] = slots.get()
+    _worker['buffers'] = np.load(buffers_path, mmap_mode='r+')
+
+
+def _price_chunk(chunk, dates, moves):
+    out = _worker['buffers'][_worker['slot']]
+    for _, position in chunk.iterrows():
+        out += price_position(position, dates, position['S'] * (1 + moves / 100.0))
+    return len(chunk)
+
+
+def generate_book_surface(positions, path, workers=None):
+    ''' Price a multi-underlying, multi-expiry book into one surface bundle at path.
+        (underlying, expiry) chunks are priced on a pool of worker processes. Each worker adds
+        its legs into its own slab of a memory mapped buffer, so results are never pickled
+        back, and the slabs are summed into the bundle at the end.
+    '''
+    workers = workers or os.cpu_count()
+    dates, moves = book_grid(positions)
+    with BundleWriter(path, dates, GREEKS, moves) as bundle:
+        buffers_path = os.path.join(bundle.tmp, 'buffers.npy')
+        buffers = np.lib.format.open_memmap(buffers_path, mode='w+', dtype=np.float64,
+                                            shape=(workers,) + bundle.shape)
+        del buffers
+        slots = multiprocessing.Queue()
+        for slot in range(workers):
+            slots.put(slot)
+        with multiprocessing.Pool(workers, _init_worker, (slots, buffers_path)) as pool:
+            for _ in pool.imap_unordered(partial(_price_chunk, dates=dates, moves=moves),
+                                         book_chunks(positions)):
+                pass
+        buffers = np.load(buffers_path, mmap_mode='r')
+        for start in range(0, len(dates), REDUCE_BLOCK):
+            bundle.write(start, buffers[:, start:start + REDUCE_BLOCK].sum(axis=0))
+        del buffers
+        os.remove(buffers_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate risk surfaces')
+    parser.add_argument('--book', help='csv of positions laid out like input_table, with an optional '
+                                       'underlying column; without it a single sample call is priced')
+    parser.add_argument('--out', help='output bundle directory for --book')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='pricing processes for --book')
+    parser.add_argument('--csv', action='store_true', help='write the sample call as a long format csv '
+                                                           'instead of a bundle')
+    args = parser.parse_args()
+    if args.book:
+        errors = []
+        positions = parse_positions(pd.read_csv(args.book).to_dict('records'), errors)
+        for error in errors:
+            print('Skipped {}'.format(error))
+        out = args.out or os.path.splitext(args.book)[0] + '.surface'
+        generate_book_surface(positions, out, workers=args.workers)
+        print('Wrote {}'.format(out))
+    elif args.csv:
+        write_surface_csv(os.path.join(os.path.dirname(__file__), "spx_test.csv"), datetime.date(2020, 9, 18))
+    else:
+        write_surface(os.path.join(os.path.dirname(__file__), "spx_test.surface"), datetime.date(2020, 9, 18))
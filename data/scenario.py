@@ -0,0 +1,41 @@
+import numpy as np
+from data.pricer import DAYS_PER_YEAR, is_call, value_and_vega
+from data.portfolio import MULTIPLIER
+
+# Default ladder: spot moves of -25%..+25% in 1% steps against vol moves of -10..+10 vol points
+SPOT_SHOCKS = np.linspace(-0.25, 0.25, 51)
+VOL_SHOCKS = np.linspace(-0.10, 0.10, 21)
+# Shocked vols are floored here so a large down shock never prices at zero or negative vol
+MIN_VOL = 1e-4
+# Legs priced per broadcast pass, bounds the (legs x vol x spot) temporaries
+LEG_CHUNK = 64
+
+
+def scenario_ladder(positions, date, spot_shocks=SPOT_SHOCKS, vol_shocks=VOL_SHOCKS, rate_shock=0.0,
+                    multiplier=MULTIPLIER):
+    ''' P&L of a positions frame (see data.portfolio.parse_positions) on ordinal date over a
+        (vol shock x spot shock) grid. Spot shocks are relative moves of every leg's own spot,
+        vol shocks absolute moves of its implied vol and rate_shock an absolute move of r.
+        P&L is against the price paid, so the unshocked ladder on a leg's evaluation date is zero.
+        Legs not yet evaluated contribute nothing and expired legs their intrinsic value.
+    '''
+    spot_shocks = np.asarray(spot_shocks, dtype=np.float64)
+    vol_shocks = np.asarray(vol_shocks, dtype=np.float64)
+    pnl = np.zeros((len(vol_shocks), len(spot_shocks)))
+    held = positions[positions['eval'] <= date]
+    live = held[held['expiry'] > date]
+    for start in range(0, len(live), LEG_CHUNK):
+        legs = live.iloc[start:start + LEG_CHUNK]
+        leg = {c: legs[c].values[:, np.newaxis, np.newaxis] for c in ('flag', 'K', 'S', 'r', 'q', 'price', 'sigma')}
+        t = (legs['expiry'].values[:, np.newaxis, np.newaxis] - date) / DAYS_PER_YEAR
+        value, _ = value_and_vega(leg['flag'], leg['S'] * (1 + spot_shocks), leg['K'], t,
+                                  leg['r'] + rate_shock,
+                                  np.maximum(leg['sigma'] + vol_shocks[:, np.newaxis], MIN_VOL), leg['q'])
+        pnl += (value - leg['price']).sum(axis=0)
+    expired = held[held['expiry'] <= date]
+    if len(expired):
+        phi = np.where(is_call(expired['flag'].values), 1.0, -1.0)[:, np.newaxis]
+        spots = expired['S'].values[:, np.newaxis] * (1 + spot_shocks)
+        payoff = np.maximum(phi * (spots - expired['K'].values[:, np.newaxis]), 0.0)
+        pnl += (payoff - expired['price'].values[:, np.newaxis]).sum(axis=0)
+    return pnl * multiplier
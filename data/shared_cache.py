@@ -0,0 +1,224 @@
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from data.surface_store import SurfaceStore, is_fresh
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+DEFAULT_DIR = os.path.join(tempfile.gettempdir(), 'ib_dashboard_cache')
+DEFAULT_MAX_BYTES = 2 ** 30
+# Puts between full scans of the cache directory, which also pick up what other processes wrote
+SCAN_EVERY = 64
+
+
+def cache_name(key):
+    ''' File name safe digest of any key with a stable repr (tuples of str, int, float) '''
+    return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+
+def content_key(store):
+    ''' Digest of a SurfaceStore's axes and values, equal surfaces share a key in every process.
+        Free for a store loaded from a bundle, see SurfaceStore.content_digest.
+    '''
+    return store.content_digest()
+
+
+def _nbytes(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+    return os.path.getsize(path)
+
+
+class FileCache:
+    ''' Cache shared by every process pointing at the same directory, surviving restarts.
+        Surfaces are kept as bundles (see BundleWriter) that are memory mapped on load, so all
+        gunicorn workers share one copy in the page cache. Other values are pickled. Reads
+        touch the entry's mtime and once the directory grows past max_bytes the entries least
+        recently used are deleted first. Writes are atomic renames, a concurrent writer of the
+        same key simply wins. The directory size is tracked as entries are written and only
+        rescanned every SCAN_EVERY puts or once the running total passes max_bytes.
+    '''
+
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._nbytes = None
+        self._puts = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, cache_name(key) + suffix)
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def peek(self, key):
+        ''' Cached value for key or None '''
+        path = self._path(key, '.pkl')
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self._count(False)
+            return None
+        self._touch(path)
+        self._count(True)
+        return value
+
+    def get(self, key, compute):
+        ''' Cached result for key, calling compute() and storing its result on a miss '''
+        value = self.peek(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        path = self._path(key, '.pkl')
+        tmp = '{}.tmp{}'.format(path, os.getpid())
+        try:
+            with open(tmp, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+            nbytes = os.path.getsize(path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self._added(nbytes)
+
+    def surface(self, key):
+        ''' Memory mapped SurfaceStore cached under key, or None '''
+        path = self._path(key, '.surface')
+        if not is_fresh(path, None):
+            self._count(False)
+            return None
+        try:
+            store = SurfaceStore.load(path)
+        except (OSError, ValueError):
+            # Evicted by another process after the freshness check
+            self._count(False)
+            return None
+        self._touch(path)
+        self._count(True)
+        return store
+
+    def put_surface(self, key, store):
+        path = self._path(key, '.surface')
+        try:
+            store.save(path)
+            nbytes = _nbytes(path)
+        except OSError:
+            return
+        self._added(nbytes)
+
+    def _added(self, nbytes):
+        with self._lock:
+            self._puts += 1
+            if self._nbytes is not None:
+                self._nbytes += nbytes
+            scan = self._nbytes is None or self._nbytes > self.max_bytes or self._puts % SCAN_EVERY == 0
+        if scan:
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if '.tmp' in name:
+                continue
+            try:
+                entries.append((os.path.getmtime(path), _nbytes(path), path))
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.remove(path)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+        with self._lock:
+            self._nbytes = total
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
+
+
+class DiskCache:
+    ''' Same interface as FileCache on top of diskcache (SQLite index plus value files), with
+        its own least recently used eviction at max_bytes. Surfaces are pickled whole, so every
+        process reading one holds its own copy rather than sharing mapped pages.
+    '''
+
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        if diskcache is None:
+            raise ImportError('the diskcache backend needs the diskcache package')
+        self.cache = diskcache.Cache(directory, size_limit=max_bytes,
+                                     eviction_policy='least-recently-used')
+        self.cache.stats(enable=True)
+
+    def peek(self, key):
+        return self.cache.get(cache_name(key))
+
+    def get(self, key, compute):
+        value = self.peek(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        self.cache.set(cache_name(key), value)
+
+    def surface(self, key):
+        parts = self.peek(('surface', key))
+        return SurfaceStore(*parts) if parts is not None else None
+
+    def put_surface(self, key, store):
+        self.put(('surface', key), (store.values, store.dates, store.plot_types, store.spots))
+
+    def stats(self):
+        hits, misses = self.cache.stats()
+        lookups = hits + misses
+        return {'hits': hits, 'misses': misses, 'entries': len(self.cache),
+                'bytes': self.cache.volume(), 'hit_rate': hits / lookups if lookups else 0.0}
+
+
+BACKENDS = {'files': FileCache, 'diskcache': DiskCache}
+
+
+def shared_cache(backend=None, directory=None, max_bytes=None):
+    ''' Cache configured by SURFACE_CACHE_BACKEND ('files' or 'diskcache'), SURFACE_CACHE_DIR
+        and SURFACE_CACHE_MAX_BYTES unless given explicitly
+    '''
+    backend = backend or os.environ.get('SURFACE_CACHE_BACKEND', 'files')
+    directory = directory or os.environ.get('SURFACE_CACHE_DIR', DEFAULT_DIR)
+    max_bytes = max_bytes or int(os.environ.get('SURFACE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+    return BACKENDS[backend](directory, max_bytes)
@@ -1,8 +1,16 @@
-from datetime import datetime
-from sqlalchemy import create_engine, func, select, ForeignKey
+from datetime import date, datetime
+from sqlalchemy import create_engine, event, func, insert, inspect, select, ForeignKey, Index
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, relationship
 from sqlalchemy.types import DateTime, Integer, String, Float
 from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Rows per executemany batch in bulk_insert_surface
+INSERT_BATCH = 50_000
+GREEK_COLUMNS = {"delta": "delta", "gamma": "gamma", "theta": "theta", "vega": "vega",
+                 "value": "present_value"}
 
 
 class Base(DeclarativeBase):
@@ -27,6 +35,9 @@ class Asset(Base):
 
 class Option(Base):
     __tablename__: str = "Options"
+    __table_args__ = (
+        Index("ix_options_asset_current_expiry", "asset_id", "current_date", "expiry_date"),
+    )
 
     id: Mapped[int] = mapped_column(Integer(), primary_key=True, nullable=False)
     asset_id: Mapped[int] = mapped_column(ForeignKey("Assets.id"))
@@ -36,6 +47,7 @@ class Option(Base):
     expiry_date: Mapped[datetime] = mapped_column(DateTime(), nullable=False)
     multiplier: Mapped[int] = mapped_column(Integer(), nullable=False)
     day_count: Mapped[Float] = mapped_column(Float(), nullable=False)
+    spot: Mapped[Float] = mapped_column(Float(), nullable=True)
     delta: Mapped[Float] = mapped_column(Float(), nullable=False)
     gamma: Mapped[Float] = mapped_column(Float(), nullable=False)
     theta: Mapped[Float] = mapped_column(Float(), nullable=False)
@@ -52,13 +64,108 @@ class Option(Base):
         )
 
 
+def create_sqlite_engine(db_path: Path) -> Engine:
+    """Engine on a SQLite file in WAL mode, so dashboard reads do not block bulk writes."""
+    engine = create_engine(rf"sqlite:///{db_path}")
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    Base.metadata.create_all(engine)
+    _migrate(engine)
+    return engine
+
+
+def _migrate(engine: Engine) -> None:
+    """Bring an Options table created before the spot column and slice index up to date.
+
+    create_all leaves existing tables alone, so both are added here; creating the index is a
+    no-op where it already exists.
+    """
+    columns = {column["name"] for column in inspect(engine).get_columns(Option.__tablename__)}
+    if "spot" not in columns:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f'ALTER TABLE "{Option.__tablename__}" ADD COLUMN spot FLOAT')
+    for index in Option.__table__.indexes:
+        index.create(engine, checkfirst=True)
+
+
+def _as_datetime(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day)
+
+
+def _sqlite_datetime(day: date) -> str:
+    # Storage format of SQLAlchemy's SQLite DateTime, so ORM and Core reads parse these rows
+    return _as_datetime(day).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def bulk_insert_surface(
+    engine: Engine,
+    asset_id: int,
+    surface,
+    expiry_date: date,
+    multiplier: int = 1000,
+    day_count: float = 365.0,
+) -> int:
+    """Write every (date, spot) cell of a SurfaceStore as one Options row.
+
+    Rows are sent as plain tuples through the driver's executemany in batches of INSERT_BATCH,
+    inside a single transaction, so neither ORM objects nor per-row bind processing are
+    involved. Cells with any NaN greek, the holes of a surface built from a sparse csv, are
+    skipped. Returns the number of rows written.
+    """
+    names = ["asset_id", "current_date", "expiry_date", "multiplier", "day_count", "spot"]
+    names += list(GREEK_COLUMNS.values())
+    sql = str(insert(Option.__table__).compile(engine, column_keys=names))
+    expiry = _sqlite_datetime(expiry_date)
+    spots = np.asarray(surface.spots, dtype=np.float64)
+    columns = [surface.greek(p) for p in GREEK_COLUMNS]
+    batch = []
+    written = 0
+    with engine.begin() as conn:
+        for i, ordinal in enumerate(surface.dates):
+            fixed = (asset_id, _sqlite_datetime(date.fromordinal(int(ordinal))), expiry, multiplier, day_count)
+            block = np.stack([column[i] for column in columns])
+            keep = ~np.isnan(block).any(axis=0)
+            batch.extend(fixed + cell for cell in zip(spots[keep].tolist(), *block[:, keep].tolist()))
+            if len(batch) >= INSERT_BATCH:
+                conn.exec_driver_sql(sql, batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            conn.exec_driver_sql(sql, batch)
+            written += len(batch)
+    return written
+
+
+def read_date_slice(engine: Engine, asset_id: int, current_date: date) -> pd.DataFrame:
+    """Greeks of every Options row of one asset on one date, ordered by expiry and spot.
+
+    Served from the (asset_id, current_date, expiry_date) index and returned as plain columns,
+    without hydrating ORM objects.
+    """
+    table = Option.__table__
+    stmt = (
+        select(table.c.expiry_date, table.c.spot, *(table.c[c] for c in GREEK_COLUMNS.values()))
+        .where(table.c.asset_id == asset_id, table.c.current_date == _as_datetime(current_date))
+        .order_by(table.c.expiry_date, table.c.spot)
+    )
+    with engine.connect() as conn:
+        result = conn.execute(stmt)
+        return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+
 def main() -> None:
     number_of_top_assets = int(
         input("How many top assets do you want to query? ")
     )
 
     db_path = Path("database/sample_database.db").absolute()
-    engine = create_engine(rf"sqlite:///{db_path}")
+    engine = create_sqlite_engine(db_path)
     session = Session(engine)
     stmt = (
         select(
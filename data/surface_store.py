@@ -0,0 +1,375 @@
+from collections import OrderedDict
+from datetime import date
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+BUNDLE_VERSION = 3
+# plot_types a lazily loaded store keeps open at once, radio_y_axis shows one at a time
+WORKING_SET = 2
+# Tries at building or loading a bundle that other processes are replacing at the same time
+ATTEMPTS = 3
+_tokens = itertools.count()
+
+
+def to_ordinals(dates):
+    ''' Convert an array-like of dates to proleptic Gregorian ordinals '''
+    days = pd.to_datetime(pd.Series(dates)).values.astype('datetime64[D]').astype(np.int64)
+    return days + EPOCH_ORDINAL
+
+
+class SurfaceStore:
+    ''' (date x plot_type x spot) surface.
+        Dates are held as ordinals and both dates and plot types have index maps, so the
+        slice for one (date, plot_type) is a direct array lookup of O(spots). Every store gets a
+        process unique token that result caches use to tell surfaces apart.
+        A store is either dense, holding values in memory, or lazy (see load), where each
+        plot_type is opened from its own file the first time it is asked for and only the
+        max_greeks most recently used ones are kept.
+    '''
+
+    def __init__(self, values, dates, plot_types, spots, loader=None, max_greeks=None, digest=None):
+        self.token = next(_tokens)
+        self._values = values
+        self._digest = digest
+        self._loader = loader
+        self.max_greeks = max_greeks
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self.dates = np.asarray(dates, dtype=np.int64)
+        self.plot_types = list(plot_types)
+        self.spots = np.asarray(spots)
+        self.date_index = {int(d): i for i, d in enumerate(self.dates)}
+        self.plot_type_index = {p: i for i, p in enumerate(self.plot_types)}
+
+    @classmethod
+    def from_frame(cls, df):
+        ''' Build a store from a long format (date, spot, plot_type, value) frame '''
+        ordinals = to_ordinals(df['date'])
+        dates, date_codes = np.unique(ordinals, return_inverse=True)
+        spots, spot_codes = np.unique(df['spot'].values, return_inverse=True)
+        plot_type_codes, plot_types = pd.factorize(df['plot_type'])
+
+        values = np.full((len(dates), len(plot_types), len(spots)), np.nan)
+        values[date_codes, plot_type_codes, spot_codes] = pd.to_numeric(df['value']).values
+        return cls(values, dates, plot_types, spots)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r', max_greeks=WORKING_SET):
+        ''' Open a bundle written by save as a lazy store. Every greek file is opened here, so the
+            store keeps working when the bundle is evicted or rebuilt later, but each plot_type is
+            only memory mapped on first use, so forked workers share pages and only touch the
+            greeks being viewed.
+        '''
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        files = {p: _open_greek(os.path.join(path, _greek_file(i))) for i, p in enumerate(meta['plot_types'])}
+        lock = threading.Lock()
+
+        def loader(plot_type):
+            f, dtype, shape, order, offset = files[plot_type]
+            with lock:
+                if mmap_mode is None:
+                    f.seek(offset)
+                    return np.fromfile(f, dtype=dtype, count=int(np.prod(shape))).reshape(shape, order=order)
+                return np.memmap(f, dtype=dtype, mode=mmap_mode, offset=offset, shape=shape, order=order)
+        return cls(None, np.load(os.path.join(path, 'dates.npy')), meta['plot_types'],
+                   np.load(os.path.join(path, 'spots.npy')), loader=loader, max_greeks=max_greeks,
+                   digest=meta.get('digest'))
+
+    def save(self, path, source=None):
+        ''' Write the store as a bundle, see BundleWriter. source is the file the surface was
+            built from, its size and mtime are recorded to detect a stale cache.
+        '''
+        with BundleWriter(path, self.dates, self.plot_types, self.spots, source=source) as bundle:
+            for plot_type in self.plot_types:
+                bundle.write(0, self.greek(plot_type), plot_type=plot_type)
+
+    def greek(self, plot_type):
+        ''' (date x spot) values of one plot_type '''
+        if self._values is not None:
+            return self._values[:, self.plot_type_index[plot_type]]
+        with self._lock:
+            if plot_type in self._loaded:
+                self._loaded.move_to_end(plot_type)
+                return self._loaded[plot_type]
+        values = self._loader(plot_type)
+        with self._lock:
+            self._loaded[plot_type] = values
+            while len(self._loaded) > self.max_greeks:
+                # Dropping the last reference unmaps the file and returns its pages
+                self._loaded.popitem(last=False)
+        return values
+
+    def content_digest(self):
+        ''' sha1 of the axes and values, equal surfaces share it in every process. A loaded bundle
+            reads it from its meta.json, written once when the bundle was built.
+        '''
+        if self._digest is None:
+            self._digest = _digest(self.dates, self.spots, self.plot_types,
+                                   (row.tobytes() for p in self.plot_types for row in self.greek(p)))
+        return self._digest
+
+    @property
+    def nbytes(self):
+        ''' Bytes of values held in process memory: all of them for a dense store, none for a lazy
+            one, whose mapped pages belong to the shared page cache
+        '''
+        return self._values.nbytes if self._values is not None else 0
+
+    @property
+    def loaded(self):
+        ''' plot_types currently held, least recently used first '''
+        return list(self._loaded) if self._values is None else list(self.plot_types)
+
+    @property
+    def values(self):
+        ''' Dense (date x plot_type x spot) values, a lazy store stacks every plot_type '''
+        if self._values is not None:
+            return self._values
+        return np.stack([self.greek(p) for p in self.plot_types], axis=1)
+
+    @property
+    def min_date(self):
+        return date.fromordinal(int(self.dates[0]))
+
+    @property
+    def max_date(self):
+        return date.fromordinal(int(self.dates[-1]))
+
+    def row(self, plot_type, ordinal):
+        ''' Values across spot for one plot_type on one date, NaN if the date is not on the surface '''
+        i = self.date_index.get(int(ordinal))
+        if i is None:
+            return np.full(len(self.spots), np.nan)
+        return self.greek(plot_type)[i]
+
+    def start_end(self, plot_type, start, end):
+        ''' Pair of spot slices for the start and end ordinal of a date range '''
+        return self.row(plot_type, start), self.row(plot_type, end)
+
+
+def _greek_file(i):
+    return 'values_{}.npy'.format(i)
+
+
+def _open_greek(path):
+    ''' Open a .npy file and read its header, returning (file, dtype, shape, order, offset) '''
+    f = open(path, 'rb')
+    try:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+    except Exception:
+        f.close()
+        raise
+    return f, dtype, shape, 'F' if fortran_order else 'C', f.tell()
+
+
+def _digest(dates, spots, plot_types, blocks):
+    # blocks are the bytes of every plot_type's (date x spot) values, plot_type by plot_type
+    digest = hashlib.sha1()
+    for part in (np.asarray(dates, dtype=np.int64), np.asarray(spots)):
+        digest.update(np.ascontiguousarray(part).tobytes())
+    digest.update(repr(list(plot_types)).encode('utf-8'))
+    for block in blocks:
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def _file_blocks(path, offset, size=2 ** 20):
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for block in iter(lambda: f.read(size), b''):
+            yield block
+
+
+class BundleWriter:
+    ''' Writes a bundle: a directory of raw .npy arrays, one (date x spot) values file per
+        plot_type, ordinal dates and spots, plus a json index of plot_types. Producers stream
+        whole dates with write, which goes through plain file I/O so memory stays bounded by
+        one block.
+        The bundle is built next to its final location and renamed into place on a clean exit,
+        so readers never see a partial bundle. If another process already put the same bundle
+        there, as workers booting together do, that one is kept and this one dropped.
+    '''
+
+    def __init__(self, path, dates, plot_types, spots, source=None):
+        self.path = path
+        self.tmp = '{}.tmp{}'.format(path, os.getpid())
+        self.plot_types = list(plot_types)
+        self.meta = {'version': BUNDLE_VERSION, 'plot_types': self.plot_types, 'source': _file_stamp(source)}
+        self.shape = (len(dates), len(self.plot_types), len(spots))
+        self.dates, self.spots = dates, spots
+        os.makedirs(self.tmp)
+        np.save(os.path.join(self.tmp, 'dates.npy'), np.asarray(dates, dtype=np.int64))
+        np.save(os.path.join(self.tmp, 'spots.npy'), np.asarray(spots))
+        self._files = []
+        self._offsets = []
+        for i in range(len(self.plot_types)):
+            greek_path = os.path.join(self.tmp, _greek_file(i))
+            header = np.lib.format.open_memmap(greek_path, mode='w+', dtype=np.float64,
+                                               shape=(len(dates), len(spots)))
+            self._offsets.append(header.offset)
+            del header
+            self._files.append(open(greek_path, 'r+b'))
+
+    def write(self, start, block, plot_type=None):
+        ''' Write block at date index start, either (dates x plot_type x spot) or, for one
+            plot_type, (dates x spot)
+        '''
+        if plot_type is not None:
+            i = self.plot_types.index(plot_type)
+            self._files[i].seek(self._offsets[i] + start * self.shape[2] * 8)
+            np.ascontiguousarray(block, dtype=np.float64).tofile(self._files[i])
+            return
+        for i, plot_type in enumerate(self.plot_types):
+            self.write(start, block[:, i], plot_type=plot_type)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for f in self._files:
+            f.close()
+        if exc_type is not None:
+            shutil.rmtree(self.tmp, ignore_errors=True)
+            return False
+        # One pass over the values at build time, so loading never has to hash them
+        self.meta['digest'] = _digest(self.dates, self.spots, self.plot_types, itertools.chain.from_iterable(
+            _file_blocks(os.path.join(self.tmp, _greek_file(i)), offset) for i, offset in enumerate(self._offsets)))
+        with open(os.path.join(self.tmp, 'meta.json'), 'w') as f:
+            json.dump(self.meta, f)
+        try:
+            self._replace()
+        except OSError:
+            shutil.rmtree(self.tmp, ignore_errors=True)
+            raise
+        return False
+
+    def _replace(self):
+        # The old bundle is renamed aside rather than deleted in place, so path is only ever
+        # missing between two renames and a concurrent writer's rename fails instead of merging
+        for _ in range(ATTEMPTS):
+            if _read_meta(self.path) == self.meta:
+                shutil.rmtree(self.tmp, ignore_errors=True)
+                return
+            old = '{}.old{}'.format(self.path, os.getpid())
+            try:
+                os.rename(self.path, old)
+            except FileNotFoundError:
+                old = None
+            try:
+                os.rename(self.tmp, self.path)
+            except OSError:
+                if not os.path.isdir(self.path):
+                    raise
+                # Another writer renamed its bundle into place in between, look at it again
+                continue
+            finally:
+                if old is not None:
+                    shutil.rmtree(old, ignore_errors=True)
+            return
+        raise OSError('could not replace {}'.format(self.path))
+
+
+def _file_stamp(path):
+    # Content digest rather than mtime, a checkout or deploy rewrites mtimes of unchanged files
+    if path is None or not os.path.exists(path):
+        return None
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(2 ** 20), b''):
+            digest.update(block)
+    return {'size': os.path.getsize(path), 'sha1': digest.hexdigest()}
+
+
+def bundle_path(csv_path):
+    ''' Default location of the binary bundle for a surface csv '''
+    return os.path.splitext(csv_path)[0] + '.surface'
+
+
+def fallback_path(csv_path):
+    ''' Bundle location in the temp dir, used when the csv sits on a read only filesystem '''
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    digest = hashlib.sha1(os.path.abspath(csv_path).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), 'ib_dashboard_surfaces', '{}-{}.surface'.format(name, digest))
+
+
+def _read_meta(path):
+    try:
+        with open(os.path.join(path, 'meta.json')) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+
+def _fresh(path, stamp):
+    meta = _read_meta(path)
+    if meta is None or meta.get('version') != BUNDLE_VERSION:
+        return False
+    return stamp is None or meta.get('source') == stamp
+
+
+def is_fresh(path, csv_path):
+    ''' True if the bundle at path exists and was built from the current content of csv_path, or
+        from anything if csv_path is None or missing
+    '''
+    return _fresh(path, _file_stamp(csv_path))
+
+
+def read_surface_csv(csv_path):
+    ''' Parse a long format surface csv, dropping the 't' and 'spot' rows of older generators '''
+    df = pd.read_csv(csv_path, usecols=['date', 'spot', 'plot_type', 'value'])
+    df = df[(df.plot_type != 'spot') & (df.plot_type != 't')]
+    return SurfaceStore.from_frame(df)
+
+
+def load_surface(csv_path, path=None):
+    ''' Memory map the binary bundle of csv_path, rebuilding it from the csv only when stale.
+        The bundle lives next to the csv, or in the temp dir (see fallback_path) where that is
+        read only, as on App Engine. If neither can be written the csv result is used as is.
+        Workers booting together may rebuild the same stale bundle at once, a bundle replaced
+        between its freshness check and its load is looked up again.
+    '''
+    paths = [path or bundle_path(csv_path), fallback_path(csv_path)]
+    stamp = _file_stamp(csv_path)
+    store = None
+    for _ in range(ATTEMPTS):
+        for candidate in paths:
+            if _fresh(candidate, stamp):
+                try:
+                    return SurfaceStore.load(candidate)
+                except OSError:
+                    continue
+        if store is None:
+            store = read_surface_csv(csv_path)
+        for candidate in paths:
+            try:
+                store.save(candidate, source=csv_path)
+            except OSError:
+                continue
+            break
+        else:
+            return store
+    return store
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the binary surface bundle for a surface csv')
+    parser.add_argument('csv_path')
+    parser.add_argument('--out', help='bundle directory, defaults to the csv path with a .surface suffix')
+    args = parser.parse_args()
+    out = args.out or bundle_path(args.csv_path)
+    read_surface_csv(args.csv_path).save(out, source=args.csv_path)
+    print('Wrote {}'.format(out))
@@ -1,73 +1,60 @@
 import dash
-import copy
 import dash_core_components as dcc
 import dash_html_components as html
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
 import dash_table
 import pandas as pd
 from datetime import datetime as dt, date
-import dash_table.FormatTemplate as FormatTemplate
-from dash_table.Format import Format, Scheme, Sign, Symbol
-import calendar
 import os
+from data.surface_store import load_surface
+from data.result_cache import ResultCache
+from data.portfolio import parse_positions, portfolio_key
+from data.scenario import SPOT_SHOCKS, VOL_SHOCKS, scenario_ladder
+from data.shared_cache import content_key, shared_cache
+from data.jobs import JobQueue
+from data.rest_client import RestPricer
+import metrics
+import views
+from utils import date_to_int, getMarks
 
 
-def date_to_int(input_date):
-    ''' Convert datetime to ordinal timestamp '''
-    return input_date.toordinal()
+# Slider moves are sliced in the browser from per plot_type payloads (assets/clientside.js)
+CLIENTSIDE_SLICING = os.environ.get('CLIENTSIDE_SLICING', '0') == '1'
+# performance_table rows per page, every (date, plot_type) of a single date fits on one
+TABLE_ROWS = 10
 
-
-def check_month_end(input_date):
-    ''' Check if input date is the last day of month '''
-    if calendar.monthrange(input_date.year, input_date.month)[1] == input_date.day:
-        return True
-    else:
-        return False
+sample_api_path = os.path.join('data/spx_test.csv')
+sample_input_path = os.path.join('data/sample_input_table.csv')
+sample_df = pd.read_csv(sample_input_path)
+surface = load_surface(sample_api_path)
+results = ResultCache()
+# Portfolio surfaces read from the shared cache, kept apart so a few dense ones cannot crowd out
+# or outgrow the callback results
+surfaces = ResultCache(max_entries=8, max_bytes=128 * 2 ** 20)
+# Portfolio surfaces and job errors shared by every gunicorn worker, keyed by portfolio hash.
+# The client holds the key of the surface it shows, so any worker can serve its callbacks.
+shared = shared_cache()
+BASE_KEY = content_key(surface)
 
 
-def getMarks(start_date, end_date, spacing=30):
-    ''' Returns the marks for labeling.
-        Every Nth value will be used.
-    '''
-    result = {}
-    for i in range(date_to_int(start_date), date_to_int(end_date) + 1):
-        date_i = date.fromordinal(i)
-        if i == date_to_int(start_date) or i == date_to_int(end_date):
-            result[i] = {'label': date_i.strftime('%d %b %y'),
-                         'style': {'text-align': 'center',
-                                   'margin': 'auto'}}
-        if date_to_int(start_date) + 14 <= i <= date_to_int(end_date) - 14:
-            if check_month_end(date_i):
-                result[i] = {'label': date_i.strftime('%d %b %y'),
-                             'style': {'text-align': 'center',
-                                       'margin': 'auto'}}
-    return result
+def publish(job):
+    ''' Put a finished job's surface, or its error, where every worker's poll_compute sees it '''
+    if job.surface is not None:
+        shared.put_surface(portfolio_key(job.positions), job.surface)
+    else:
+        shared.put(('job_error', job.job_id), job.error)
+    jobs.pop(job.job_id)
 
 
-sample_api_path = os.path.join('data/spx_test.csv')
-sample_input_path = os.path.join('data/sample_input_table.csv')
-sample_df = pd.read_csv(sample_input_path)
-api_data = pd.read_csv(sample_api_path)
-api_data = api_data[(api_data.plot_type != 'spot') & (api_data.plot_type != 't')]
-api_data['date'] = api_data['date'].apply(lambda x: dt.strptime(x, "%Y-%m-%d").date())
-api_data['value'] = pd.to_numeric(api_data['value'])
-plot_type = api_data['plot_type'].unique()
-
-layout = dict(
-    autosize=True,
-    automargin=True,
-    margin=dict(l=30, r=30, b=20, t=40),
-    hovermode="closest",
-    plot_bgcolor="#F9F9F9",
-    paper_bgcolor="#F9F9F9",
-    legend=dict(font=dict(size=10), orientation="h"),
-    title="Satellite Overview"
-)
+# With PRICER_URL set, portfolio legs are priced by the Go service (data/RestAPI) in batches
+jobs = JobQueue(on_done=publish, pricer=RestPricer() if os.environ.get('PRICER_URL') else None)
+plot_type = surface.plot_types
 
 # lower = datetime.date(2020, 5, 30)
 # upper = datetime.date(2020, 6, 8)
-min_date = min(api_data['date'])
-max_date = max(api_data['date'])
+min_date = surface.min_date
+max_date = surface.max_date
 
 colors = {
     'background': 'rgb(230, 230, 230)',
@@ -79,11 +66,19 @@ colors = {
 }
 app = dash.Dash(__name__, assets_folder='assets')
 server = app.server
+# Per callback latency, response size and cache stats on /metrics, summed over the gunicorn
+# workers when METRICS_DIR is set
+callback_metrics = metrics.instrument(app, caches={'results': results, 'surfaces': surfaces, 'shared': shared},
+                                      directory=os.environ.get('METRICS_DIR'))
 app.config.suppress_callback_exceptions = True
 
 app.layout = html.Div(
     [
         dcc.Store(id='compute_engine'),
+        dcc.Store(id='surface_token', data=BASE_KEY),
+        dcc.Store(id='spot_payload'),
+        dcc.Store(id='table_payload'),
+        dcc.Interval(id='compute_poll', interval=500, disabled=True),
         html.Div(
             [
                 html.Div(
@@ -148,6 +143,18 @@ app.layout = html.Div(
                                 ),
                             ],
                         ),
+                        html.Div(
+                            [
+                                html.H3('Rate Shock (bp)'),
+                                dcc.Dropdown(
+                                    id="rate_shock",
+                                    options=[{'value': i, 'label': i} for i in
+                                             range(-100, 101, 25)],
+                                    value=0,
+                                    clearable=False
+                                ),
+                            ],
+                        ),
                     ],
                     id="info-container_2",
                     className="pretty_container four columns",
@@ -224,6 +231,8 @@ app.layout = html.Div(
                                         html.Button('Compute', id='compute', n_clicks=0),
                                     ], className='row'
                                 ),
+                                html.Div(id='compute_status', style={'text-align': 'left'}),
+                                html.Div(id='surface_status', style={'text-align': 'left'}),
                                 html.Div(
                                     [
                                         # html.P('Date reference'),
@@ -240,8 +249,17 @@ app.layout = html.Div(
                                         )
                                     ], className='date-slider'
                                 ),
-                                dcc.Graph(
-                                    id='graph_dynamic',
+                                html.Div(
+                                    [
+                                        dcc.Graph(
+                                            id='graph_dynamic',
+                                            className='six columns',
+                                        ),
+                                        dcc.Graph(
+                                            id='scenario_heatmap',
+                                            className='six columns',
+                                        ),
+                                    ], className='row'
                                 ),
                                 html.Div(id='output-container-range-slider',
                                          style={'text-align': 'left'}),
@@ -264,9 +282,21 @@ app.layout = html.Div(
                         html.Div(
                             id='output_date_picker'
                         ),
+                        html.Div(
+                            [
+                                html.H6('Spot columns'),
+                                dcc.Slider(id='table_window', min=0, max=0, step=1, value=0),
+                            ],
+                            # Clientside slicing sends every column and pages in the browser
+                            style={'display': 'none'} if CLIENTSIDE_SLICING else {},
+                        ),
                         dash_table.DataTable(
                             id='performance_table',
-                            filter_action="native",
+                            filter_action='native' if CLIENTSIDE_SLICING else 'custom',
+                            page_action='native' if CLIENTSIDE_SLICING else 'custom',
+                            filter_query='',
+                            page_current=0,
+                            page_size=TABLE_ROWS,
                             style_header=colors,
                             style_as_list_view=True,
                             style_table={'overflowX': 'scroll'}
@@ -307,8 +337,6 @@ app.layout = html.Div(
 #
 #     return data[0] + " mcf", data[1] + " bbl", data[2] + " bbl"
 
-@app.callback(Output('output-container-range-slider', 'children'),
-              [Input('date_slider', 'value')])
 def update_output(date_slider):
     start_date = date.fromordinal(min(date_slider))
     end_date = date.fromordinal(max(date_slider))
@@ -316,49 +344,44 @@ def update_output(date_slider):
                                                  dt.strftime(end_date, '%d-%b-%y'))
 
 
-@app.callback(Output('graph_dynamic', 'figure'),
-              [Input('radio_y_axis', 'value'),
-               Input('date_slider', 'value')])
-def graph_against_spot(y_axis, date_slider):
-    layout_main_graph = copy.deepcopy(layout)
+def surface_for(surface_token):
+    ''' Key and store of the surface the client shows, the sample surface for BASE_KEY. A
+        portfolio surface gone from the shared cache is not replaced by the sample one, whose dates
+        would not match the slider, the callback is skipped and surface_status reports it.
+    '''
+    if not surface_token or surface_token == BASE_KEY:
+        return BASE_KEY, surface
+    store = surfaces.get(surface_token, lambda: shared.surface(surface_token))
+    if store is None:
+        raise PreventUpdate
+    return surface_token, store
 
-    start_date = date.fromordinal(min(date_slider))
-    end_date = date.fromordinal(max(date_slider))
-    df = api_data.loc[(api_data['date'] == start_date) & (api_data['plot_type'] == y_axis)]
-    ref_df = api_data.loc[(api_data['date'] == end_date) & (api_data['plot_type'] == y_axis)]
-    join_df = ref_df.merge(right=df, how='left', on=['spot', 'plot_type'], suffixes=['_end', '_start'])
-
-    colors = []
-    for i in range(min(join_df.spot), max(join_df.spot) + 1):
-        colors.append("rgb(123, 199, 255)")
-
-    data = [
-        dict(
-            type='bar',
-            x=join_df['spot'],
-            y=(join_df.value_start - join_df.value_end).astype(int),
-            name='Start-End',
-            marker=dict(color=colors),
-        ),
-        dict(
-            x=df['spot'],
-            y=df['value'],
-            mode='lines',
-            name='Start',
-        ),
-        dict(
-            x=ref_df['spot'],
-            y=ref_df['value'],
-            mode='lines',
-            name='End',
-        ),
-    ]
-    layout_main_graph['title'] = 'Graph vs spot'
-    layout_main_graph["showlegend"] = True
-    layout_main_graph["autosize"] = True
-    layout_main_graph["hovermode"] = 'compare'
-    figure = dict(data=data, layout=layout_main_graph)
-    return figure
+
+@app.callback(Output('surface_status', 'children'),
+              [Input('surface_token', 'data'), Input('radio_y_axis', 'value'), Input('input_gap', 'value')])
+def surface_status(surface_token, y_axis, input_gap):
+    try:
+        surface_for(surface_token)
+    except PreventUpdate:
+        return 'The portfolio surface is no longer cached, press Compute to price it again.'
+    return ''
+
+
+def cached(key, compute):
+    # Per slider move results stay in the worker, only surfaces and job errors are shared
+    return results.get(key, compute)
+
+
+def graph_against_spot(y_axis, date_slider, surface_token):
+    key, store = surface_for(surface_token)
+    start, end = min(date_slider), max(date_slider)
+    return cached(('spot_figure', key, y_axis, start, end),
+                  lambda: views.spot_figure(store, y_axis, start, end))
+
+
+def spot_payload(y_axis, surface_token):
+    key, store = surface_for(surface_token)
+    return cached(('spot_payload', key, y_axis), lambda: views.spot_payload(store, y_axis))
 
 
 @app.callback(
@@ -376,44 +399,138 @@ def add_row(n_clicks, rows, columns):
               [Input('compute', 'n_clicks')],
               [State('input_table', 'data'),
                State('input_table', 'columns')])
-def add_row(n_clicks, data, columns):
-    if n_clicks > 0:
-        pass
-    return data
+def compute(n_clicks, data, columns):
+    if n_clicks == 0:
+        raise PreventUpdate
+    errors = []
+    positions = parse_positions(data, errors)
+    if positions.empty:
+        return {'job_id': None, 'portfolio': None, 'errors': errors}
+    key = portfolio_key(positions)
+    results.put(('positions', key), positions)
+    if shared.surface(key) is not None:
+        # Priced before, by this or any other worker
+        return {'job_id': None, 'portfolio': key, 'errors': errors}
+    return {'job_id': jobs.submit(positions), 'portfolio': key, 'errors': errors}
+
 
+@app.callback([Output('compute_status', 'children'),
+               Output('compute_poll', 'disabled'),
+               Output('surface_token', 'data'),
+               Output('date_slider', 'min'),
+               Output('date_slider', 'max'),
+               Output('date_slider', 'value'),
+               Output('date_slider', 'marks')],
+              [Input('compute_poll', 'n_intervals'),
+               Input('compute_engine', 'data')])
+def poll_compute(n_intervals, compute_engine):
+    if not compute_engine:
+        raise PreventUpdate
+    key, job_id = compute_engine['portfolio'], compute_engine['job_id']
+    errors = compute_engine.get('errors') or []
+    skipped = ' Skipped {}.'.format('; '.join(errors)) if errors else ''
+    unchanged = [dash.no_update] * 4
+    if key is None:
+        return ['No valid positions to price.' + skipped, True, dash.no_update] + unchanged
+    store = shared.surface(key)
+    if store is None:
+        error = shared.peek(('job_error', job_id)) if job_id else 'surface was evicted'
+        if error is not None:
+            return ['Pricing failed: {}.'.format(error) + skipped, True, dash.no_update] + unchanged
+        # Progress is only known to the worker running the job
+        status = jobs.status(job_id)
+        progress = ' {:.0%}'.format(status['progress']) if status['state'] == 'running' else ''
+        return ['Pricing portfolio...' + progress + skipped, False, dash.no_update] + unchanged
+    if not len(store.dates):
+        return ['Portfolio surface is empty.' + skipped, True, dash.no_update] + unchanged
+    start, end = date_to_int(store.min_date), date_to_int(store.max_date)
+    return ['Portfolio surface from {} to {}.'.format(store.min_date, store.max_date) + skipped, True, key,
+            start, end, [start, end], getMarks(store.min_date, store.max_date)]
 
-@app.callback([Output('performance_table', 'columns'), Output('performance_table', 'data'),
-               Output('performance_table', 'style_data_conditional')],
-              [Input('input_gap', 'value'), Input('date_slider', 'value')])
-def simple_dash_table(input_gap, date_slider):
+
+@app.callback(Output('scenario_heatmap', 'figure'),
+              [Input('compute_engine', 'data'),
+               Input('date_slider', 'value'),
+               Input('rate_shock', 'value')],
+              [State('input_table', 'data')])
+def scenario_figure(compute_engine, date_slider, rate_shock, data):
+    # Fires on every slider drag step, so it is keyed on the computed book and only parses the
+    # table and solves implied vols on a miss
+    key = (compute_engine or {}).get('portfolio')
+    if key is None:
+        raise PreventUpdate
+    on_date, rate_shock = max(date_slider), rate_shock or 0
+    return cached(('scenario', key, on_date, rate_shock),
+                  lambda: views.scenario_heatmap(
+                      scenario_ladder(book_positions(key, data), on_date, rate_shock=rate_shock / 1e4),
+                      SPOT_SHOCKS, VOL_SHOCKS, date.fromordinal(on_date)))
+
+
+def book_positions(key, data):
+    # Positions of the book computed under key, parsed once per worker. Rows edited since
+    # Compute no longer make up that book, the heatmap then waits for the next Compute.
+    def parse():
+        positions = parse_positions(data)
+        return positions if not positions.empty and portfolio_key(positions) == key else None
+    positions = cached(('positions', key), parse)
+    if positions is None:
+        raise PreventUpdate
+    return positions
+
+
+def simple_dash_table(input_gap, date_slider, surface_token, page_current, page_size, filter_query, window):
     # input_date = dt.strptime(re.split('T| ', input_date)[0], '%Y-%m-%d').date()
-    start_date = date.fromordinal(min(date_slider))
-    end_date = date.fromordinal(max(date_slider))
-    df = api_data[(api_data['date'] == start_date) | (api_data['date'] == end_date)]
-    pt = df.pivot_table(columns=['spot'], values='value', index=['date', 'plot_type'],
-                        aggfunc=sum).reset_index()
-    # pt = pt[(pt.plot_type != 'spot') & (pt.plot_type != 't')]
-    for i in pt.columns:
-        if isinstance(i, int):
-            pt[i] = pd.to_numeric(pt[i])
-    columns = [{'id': 'date', 'name': 'date', 'type': 'text'}] + \
-              [{'id': 'plot_type', 'name': 'plot_type', 'type': 'text'}] + \
-              [{'id': str(i),
-                'name': str(i),
-                'type': 'numeric',
-                'format': Format(
-                    nully='N/A',
-                    precision=2,
-                    scheme=Scheme.fixed,
-                    sign=Sign.parantheses
-                )}
-               for i in pt.columns if isinstance(i, int) and i % int(input_gap) == 0]
-    data = pt[[i for i in pt.columns if isinstance(i, str) or i % int(input_gap) == 0]].to_dict('records')
-    style_data_conditional = [{'if': {'row_index': 'odd'}, 'backgroundColor': '#e2f2f6'}] + \
-                             [{'if': {'column_id': col['id'], 'filter_query': '{}<0.0'.format("{" + col['id'] + "}")},
-                               'color': 'red'}
-                              for col in columns if col['type'] == 'numeric']
-    return columns, data, style_data_conditional
+    key, store = surface_for(surface_token)
+    start, end = min(date_slider), max(date_slider)
+    return cached(('performance_table', key, start, end, input_gap, page_current, page_size, filter_query, window),
+                  lambda: views.performance_table(store, start, end, input_gap, page_current, page_size,
+                                                  filter_query, window or 0))
+
+
+def table_windows(input_gap, surface_token):
+    # Around ten labelled marks whatever the number of column windows
+    key, store = surface_for(surface_token)
+    labels = cached(('column_windows', key, input_gap), lambda: views.column_windows(store, input_gap))
+    every = max(len(labels) // 10, 1)
+    return max(len(labels) - 1, 0), {i: labels[i] for i in range(0, len(labels), every)}
+
+
+def table_payload(input_gap, surface_token):
+    key, store = surface_for(surface_token)
+    return cached(('table_payload', key, input_gap), lambda: views.table_payload(store, input_gap))
+
+
+if CLIENTSIDE_SLICING:
+    # The server only sends a payload when the plot_type, input_gap or surface changes
+    app.callback(Output('spot_payload', 'data'),
+                 [Input('radio_y_axis', 'value'), Input('surface_token', 'data')])(spot_payload)
+    app.callback([Output('table_payload', 'data'), Output('performance_table', 'columns'),
+                  Output('performance_table', 'style_data_conditional')],
+                 [Input('input_gap', 'value'), Input('surface_token', 'data')])(table_payload)
+    app.clientside_callback(ClientsideFunction(namespace='surface', function_name='range_text'),
+                            Output('output-container-range-slider', 'children'),
+                            [Input('date_slider', 'value')])
+    app.clientside_callback(ClientsideFunction(namespace='surface', function_name='spot_figure'),
+                            Output('graph_dynamic', 'figure'),
+                            [Input('spot_payload', 'data'), Input('date_slider', 'value')])
+    app.clientside_callback(ClientsideFunction(namespace='surface', function_name='performance_table'),
+                            Output('performance_table', 'data'),
+                            [Input('table_payload', 'data'), Input('date_slider', 'value')])
+else:
+    app.callback(Output('output-container-range-slider', 'children'),
+                 [Input('date_slider', 'value')])(update_output)
+    app.callback(Output('graph_dynamic', 'figure'),
+                 [Input('radio_y_axis', 'value'), Input('date_slider', 'value'),
+                  Input('surface_token', 'data')])(graph_against_spot)
+    # Only the visible page and window of spot columns leave the server
+    app.callback([Output('table_window', 'max'), Output('table_window', 'marks')],
+                 [Input('input_gap', 'value'), Input('surface_token', 'data')])(table_windows)
+    app.callback([Output('performance_table', 'columns'), Output('performance_table', 'data'),
+                  Output('performance_table', 'style_data_conditional')],
+                 [Input('input_gap', 'value'), Input('date_slider', 'value'),
+                  Input('surface_token', 'data'), Input('performance_table', 'page_current'),
+                  Input('performance_table', 'page_size'), Input('performance_table', 'filter_query'),
+                  Input('table_window', 'value')])(simple_dash_table)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,213 @@
+import functools
+import json
+import os
+import threading
+import time
+import flask
+
+# Upper bounds of the latency (seconds) and payload (bytes) histogram buckets, +Inf is implied
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (1e3, 1e4, 3e4, 1e5, 3e5, 1e6, 3e6, 1e7)
+# Seconds between snapshots written to METRICS_DIR
+SNAPSHOT_INTERVAL = 1.0
+# Snapshots not rewritten for this long are left out of the totals, their pid may be reused
+STALE_AFTER = 3600.0
+
+
+def _histogram(buckets):
+    return {'buckets': [0] * (len(buckets) + 1), 'sum': 0.0, 'count': 0}
+
+
+def _observe(hist, buckets, value):
+    i = 0
+    while i < len(buckets) and value > buckets[i]:
+        i += 1
+    hist['buckets'][i] += 1
+    hist['sum'] += value
+    hist['count'] += 1
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merge(into, snapshot):
+    for family in ('latency', 'bytes'):
+        for name, hist in snapshot[family].items():
+            target = into[family].setdefault(name, {'buckets': [0] * len(hist['buckets']), 'sum': 0.0, 'count': 0})
+            target['buckets'] = [a + b for a, b in zip(target['buckets'], hist['buckets'])]
+            target['sum'] += hist['sum']
+            target['count'] += hist['count']
+    for key, n in snapshot['exceptions'].items():
+        into['exceptions'][key] = into['exceptions'].get(key, 0) + n
+    for cache, stats in snapshot['caches'].items():
+        target = into['caches'].setdefault(cache, {})
+        for stat in ('hits', 'misses', 'evictions', 'entries', 'bytes'):
+            if stat in stats:
+                target[stat] = target.get(stat, 0) + stats[stat]
+
+
+class CallbackMetrics:
+    ''' Latency and response size histograms of every server side Dash callback, plus the
+        stats of the result caches, rendered in the Prometheus text format.
+        Counters live in the process. With directory set, every process also writes a snapshot
+        there at most once per SNAPSHOT_INTERVAL and a scrape of any gunicorn worker sums the
+        snapshots of all of them. Snapshots of processes that exited are removed and ones older
+        than STALE_AFTER skipped, so restarted workers do not leave their gauges in the totals.
+    '''
+
+    def __init__(self, caches=None, directory=None):
+        self.caches = caches or {}
+        self.directory = directory
+        self.latency = {}
+        self.bytes = {}
+        self.exceptions = {}
+        self._written = 0.0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def observe_latency(self, callback, seconds):
+        with self._lock:
+            _observe(self.latency.setdefault(callback, _histogram(LATENCY_BUCKETS)), LATENCY_BUCKETS, seconds)
+        self._maybe_write()
+
+    def observe_bytes(self, callback, nbytes):
+        with self._lock:
+            _observe(self.bytes.setdefault(callback, _histogram(BYTES_BUCKETS)), BYTES_BUCKETS, nbytes)
+
+    def count_exception(self, callback, exception):
+        key = '{}|{}'.format(callback, exception)
+        with self._lock:
+            self.exceptions[key] = self.exceptions.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            state = json.loads(json.dumps({'latency': self.latency, 'bytes': self.bytes,
+                                           'exceptions': self.exceptions}))
+        state['caches'] = {name: cache.stats() for name, cache in self.caches.items()}
+        return state
+
+    def _maybe_write(self, force=False):
+        now = time.time()
+        if not self.directory or (not force and now - self._written < SNAPSHOT_INTERVAL):
+            return
+        self._written = now
+        path = os.path.join(self.directory, '{}.json'.format(os.getpid()))
+        tmp = path + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, path)
+        except OSError:
+            # Metrics must never fail a callback
+            pass
+
+    def collect(self):
+        ''' This process's snapshot, or the sum over every process sharing the directory '''
+        if not self.directory:
+            return self.snapshot()
+        self._maybe_write(force=True)
+        total = {'latency': {}, 'bytes': {}, 'exceptions': {}, 'caches': {}}
+        now = time.time()
+        for name in os.listdir(self.directory):
+            pid, ext = os.path.splitext(name)
+            if ext != '.json' or not pid.isdigit():
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if not _alive(int(pid)):
+                    os.remove(path)
+                    continue
+                if now - os.path.getmtime(path) > STALE_AFTER:
+                    continue
+                with open(path) as f:
+                    _merge(total, json.load(f))
+            except (OSError, ValueError):
+                continue
+        return total
+
+    def render(self):
+        ''' Prometheus text exposition of collect() '''
+        state = self.collect()
+        lines = []
+        for family, unit, buckets, help_text in (
+                ('latency', 'seconds', LATENCY_BUCKETS, 'Time spent in the callback function'),
+                ('bytes', 'bytes', BYTES_BUCKETS, 'Uncompressed size of the callback response')):
+            name = 'dash_callback_{}_{}'.format('duration' if family == 'latency' else 'response', unit)
+            lines += ['# HELP {} {}'.format(name, help_text), '# TYPE {} histogram'.format(name)]
+            for callback, hist in sorted(state[family].items()):
+                cumulative = 0
+                for bound, n in zip(list(buckets) + ['+Inf'], hist['buckets']):
+                    cumulative += n
+                    lines.append('{}_bucket{{callback="{}",le="{}"}} {}'.format(name, callback, bound, cumulative))
+                lines.append('{}_sum{{callback="{}"}} {}'.format(name, callback, hist['sum']))
+                lines.append('{}_count{{callback="{}"}} {}'.format(name, callback, hist['count']))
+        lines += ['# HELP dash_callback_exceptions_total Exceptions raised by callbacks, PreventUpdate included',
+                  '# TYPE dash_callback_exceptions_total counter']
+        for key, n in sorted(state['exceptions'].items()):
+            callback, exception = key.split('|')
+            lines.append('dash_callback_exceptions_total{{callback="{}",exception="{}"}} {}'.format(
+                callback, exception, n))
+        for stat, kind in (('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'),
+                           ('entries', 'gauge'), ('bytes', 'gauge'), ('hit_ratio', 'gauge')):
+            name = 'dash_cache_{}{}'.format(stat, '_total' if kind == 'counter' else '')
+            lines.append('# TYPE {} {}'.format(name, kind))
+            for cache, stats in sorted(state['caches'].items()):
+                if stat == 'hit_ratio':
+                    lookups = stats.get('hits', 0) + stats.get('misses', 0)
+                    value = stats.get('hits', 0) / lookups if lookups else 0.0
+                elif stat in stats:
+                    value = stats[stat]
+                else:
+                    continue
+                lines.append('{}{{cache="{}"}} {}'.format(name, cache, value))
+        return '\n'.join(lines) + '\n'
+
+
+def instrument(app, caches=None, directory=None, route='/metrics'):
+    ''' Time every callback registered on app from now on and serve the metrics at route.
+        Must be called before the callbacks are declared.
+    '''
+    metrics = CallbackMetrics(caches, directory)
+    register = app.callback
+
+    def callback(*args, **kwargs):
+        decorator = register(*args, **kwargs)
+
+        def wrap(func):
+            @functools.wraps(func)
+            def timed(*func_args, **func_kwargs):
+                if flask.has_request_context():
+                    flask.g.callback = func.__name__
+                start = time.perf_counter()
+                try:
+                    return func(*func_args, **func_kwargs)
+                except Exception as e:
+                    metrics.count_exception(func.__name__, type(e).__name__)
+                    raise
+                finally:
+                    metrics.observe_latency(func.__name__, time.perf_counter() - start)
+            return decorator(timed)
+        return wrap
+
+    app.callback = callback
+
+    @app.server.after_request
+    def response_size(response):
+        name = flask.g.get('callback')
+        if name is not None and not response.direct_passthrough:
+            metrics.observe_bytes(name, len(response.get_data()))
+        return response
+
+    @app.server.route(route)
+    def serve_metrics():
+        return flask.Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    return metrics
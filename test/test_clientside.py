@@ -0,0 +1,74 @@
+from datetime import date
+import json
+import os
+import shutil
+import subprocess
+import unittest
+import numpy as np
+import plotly
+import views
+from data.surface_store import SurfaceStore
+
+CLIENTSIDE_JS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'clientside.js')
+
+# Evaluates assets/clientside.js in node and applies its functions to the payloads read from stdin
+RUNNER = '''
+global.window = {};
+eval(require('fs').readFileSync(process.argv[1], 'utf8'));
+const surface = window.dash_clientside.surface;
+const input = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+process.stdout.write(JSON.stringify(input.sliders.map(slider => ({
+    text: surface.range_text(slider),
+    figure: surface.spot_figure(input.spot_payload, slider),
+    table: surface.performance_table(input.table_payload, slider)
+}))));
+'''
+
+
+def plain(obj):
+    return json.loads(json.dumps(obj, cls=plotly.utils.PlotlyJSONEncoder))
+
+
+def store(n_dates=40, n_spots=1501):
+    rng = np.random.RandomState(0)
+    dates = np.arange(date(2020, 5, 11).toordinal(), date(2020, 5, 11).toordinal() + n_dates)
+    values = rng.normal(scale=100, size=(n_dates, 3, n_spots)).cumsum(axis=2)
+    return SurfaceStore(values, dates, ['value', 'delta', 'gamma'], np.arange(200, 200 + n_spots))
+
+
+@unittest.skipIf(shutil.which('node') is None, 'needs node')
+class TestClientside(unittest.TestCase):
+    ''' The browser slicing of CLIENTSIDE_SLICING against the server callbacks it replaces '''
+
+    def run_js(self, surface, sliders, input_gap):
+        table_payload = views.table_payload(surface, input_gap)[0]
+        payload = {'spot_payload': views.spot_payload(surface, 'delta'), 'table_payload': table_payload,
+                   'sliders': sliders}
+        out = subprocess.run(['node', '-e', RUNNER, CLIENTSIDE_JS], input=json.dumps(payload).encode('utf-8'),
+                             stdout=subprocess.PIPE, check=True)
+        return json.loads(out.stdout.decode('utf-8'))
+
+    def test_matches_server(self):
+        surface = store()
+        first, last = int(surface.dates[0]), int(surface.dates[-1])
+        sliders = [[first + 3, last - 5], [last - 5, first + 3], [first + 7, first + 7], [first, last + 10]]
+        for input_gap in (1, 7):
+            for slider, js in zip(sliders, self.run_js(surface, sliders, input_gap)):
+                start, end = min(slider), max(slider)
+                self.assertEqual(js['text'], 'Examining data from {:%d-%b-%y} to {:%d-%b-%y}'.format(
+                    date.fromordinal(start), date.fromordinal(end)))
+                self.assertEqual(js['table'], plain(views.performance_table(surface, start, end, input_gap)[1]))
+                if end <= last:
+                    self.assertEqual(js['figure']['data'], plain(views.spot_figure(surface, 'delta', start, end)['data']))
+
+    def test_nan_cells_are_null(self):
+        surface = store(n_dates=5, n_spots=30)
+        surface.values[2, :, 4:9] = np.nan
+        slider = [int(surface.dates[0]), int(surface.dates[2])]
+        js = self.run_js(surface, [slider], 1)[0]
+        self.assertEqual(js['table'], plain(views.performance_table(surface, slider[0], slider[1], 1)[1]))
+        self.assertIsNone(js['table'][-1]['205'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import numpy as np
+from data.decimate import decimate, minmax_indices
+
+
+class TestMinmaxIndices(unittest.TestCase):
+
+    def test_keeps_extremes_and_ends(self):
+        rng = np.random.RandomState(0)
+        for n, n_buckets in ((1000, 10), (1001, 7), (5000, 500), (99, 40)):
+            y = rng.normal(size=n).cumsum()
+            idx = minmax_indices(y, n_buckets)
+            self.assertEqual(idx[0], 0)
+            self.assertEqual(idx[-1], n - 1)
+            self.assertTrue((np.diff(idx) > 0).all())
+            self.assertLessEqual(len(idx), 2 * n_buckets + 2)
+            width = -(-n // n_buckets)
+            for start in range(0, n, width):
+                bucket = y[start:start + width]
+                self.assertIn(start + bucket.argmin(), idx)
+                self.assertIn(start + bucket.argmax(), idx)
+
+    def test_short_series_returned_whole(self):
+        for n in (0, 1, 5, 22):
+            np.testing.assert_array_equal(minmax_indices(np.arange(n, dtype=float), 10), np.arange(n))
+        # One past the limit is bucketed, 3 wide buckets of a rising series keep their ends
+        self.assertEqual(minmax_indices(np.arange(23, dtype=float), 10).tolist(),
+                         sorted(set(range(0, 23, 3)) | set(range(2, 23, 3)) | {22}))
+
+    def test_nan_buckets(self):
+        y = np.arange(100, dtype=float)
+        y[10:40] = np.nan
+        y[55] = -5.0
+        idx = minmax_indices(y, 10)
+        self.assertIn(55, idx)
+        self.assertIn(99, idx)
+        # An all NaN bucket picks nothing but its first index, which is always in range
+        self.assertTrue((idx < 100).all())
+        self.assertEqual(minmax_indices(np.full(50, np.nan), 5).tolist(),
+                         sorted({0, 49} | set(range(0, 50, 10))))
+
+    def test_decimate_bounds_points(self):
+        x = np.arange(10000)
+        y = np.sin(x / 50.0)
+        dx, dy = decimate(x, y, 1000)
+        self.assertLessEqual(len(dx), 1002)
+        self.assertEqual(dy.max(), y.max())
+        self.assertEqual(dy.min(), y.min())
+        np.testing.assert_array_equal(dy, y[dx])
+
+
+if __name__ == '__main__':
+    unittest.main()
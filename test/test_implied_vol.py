@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+from data.implied_vol import MAX_VOL, implied_vol
+from data.pricer import black_scholes_grid
+
+
+class TestImpliedVol(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        n = 2000
+        self.flag = rng.choice(['c', 'p'], n)
+        self.S = rng.uniform(50, 150, n)
+        self.K = self.S * rng.uniform(0.7, 1.3, n)
+        self.t = rng.uniform(0.05, 3.0, n)
+        self.r = rng.uniform(-0.01, 0.08, n)
+        self.q = rng.uniform(0.0, 0.04, n)
+        self.sigma = rng.uniform(0.05, 1.5, n)
+
+    def test_round_trip(self):
+        greeks = black_scholes_grid(self.flag, self.S, self.K, self.t, self.r, self.sigma, self.q)
+        price = greeks['value']
+        solved = implied_vol(price, self.flag, self.S, self.K, self.t, self.r, self.q)
+        self.assertFalse(np.isnan(solved).any())
+        repriced = black_scholes_grid(self.flag, self.S, self.K, self.t, self.r, solved, self.q)['value']
+        np.testing.assert_allclose(repriced, price, rtol=0, atol=1e-8)
+        # Far out of the money legs carry too little vega to pin the vol down, only prices match there
+        sensitive = greeks['vega'] > 1e-2
+        self.assertGreater(sensitive.mean(), 0.9)
+        np.testing.assert_allclose(solved[sensitive], self.sigma[sensitive], rtol=1e-6)
+
+    def test_outside_no_arbitrage_bounds_is_nan(self):
+        S, K, t, r, q = 100.0, 90.0, 1.0, 0.05, 0.01
+        s_fwd, k_disc = S * np.exp(-q * t), K * np.exp(-r * t)
+        call_prices = [s_fwd - k_disc - 0.01, s_fwd, s_fwd + 1, -1.0]
+        put_prices = [0.0, k_disc, k_disc + 1]
+        self.assertTrue(np.isnan(implied_vol(call_prices, 'c', S, K, t, r, q)).all())
+        self.assertTrue(np.isnan(implied_vol(put_prices, 'p', S, K, t, r, q)).all())
+        self.assertTrue(np.isnan(implied_vol(10.0, 'c', S, K, 0.0, r, q)))
+
+    def test_broadcast_shape(self):
+        price = black_scholes_grid('c', 100.0, np.array([[90.0], [110.0]]), np.array([0.5, 1.0, 2.0]), 0.02,
+                                   0.25)['value']
+        solved = implied_vol(price, 'Call', 100.0, np.array([[90.0], [110.0]]), np.array([0.5, 1.0, 2.0]), 0.02)
+        self.assertEqual(solved.shape, (2, 3))
+        np.testing.assert_allclose(solved, 0.25, rtol=1e-8)
+        self.assertLessEqual(np.nanmax(solved), MAX_VOL)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import time
+import unittest
+from unittest import mock
+import numpy as np
+from data.jobs import Job, JobQueue
+from data.portfolio import PortfolioSurface, parse_positions, portfolio_grid, price_position
+from test.test_portfolio import ROW, book
+
+
+def wait(queue, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while queue.status(job_id)['state'] == 'running':
+        if time.time() > deadline:
+            raise AssertionError('job did not finish')
+        time.sleep(0.05)
+    return queue.status(job_id)
+
+
+def die():
+    time.sleep(0.3)
+    os._exit(1)
+
+
+def expected(positions, dates, spots):
+    return sum(price_position(p, dates, spots) for _, p in positions.iterrows())
+
+
+class TestJobQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.done = []
+        self.queue = JobQueue(on_done=self.done.append)
+        self.positions = parse_positions(book())
+
+    def test_job_prices_book(self):
+        job_id = self.queue.submit(self.positions)
+        self.assertEqual(wait(self.queue, job_id)['state'], 'done')
+        surface = self.queue.pop(job_id)
+        np.testing.assert_allclose(surface.values, expected(self.positions, surface.dates, surface.spots),
+                                   rtol=1e-12, atol=1e-9)
+        self.assertEqual([job.job_id for job in self.done], [job_id])
+
+    def test_pruned_legs_resubmitted_instead_of_priced_under_lock(self):
+        # Start the pool before patching, its process keeps the real pricer
+        wait(self.queue, self.queue.submit(self.positions.iloc[:1]))
+        dates, spots = portfolio_grid(self.positions)
+        current = PortfolioSurface(dates, spots)
+        self.queue.portfolio = current
+        job = Job('moved', self.positions, PortfolioSurface(dates, spots), [])
+        self.queue._jobs[job.job_id] = job
+        with mock.patch('data.portfolio.price_position', side_effect=AssertionError('priced under the lock')):
+            self.queue._collect(job)
+            self.assertEqual(job.state, 'running')
+            self.assertTrue(job.futures)
+        self.assertEqual(wait(self.queue, 'moved')['state'], 'done', job.error)
+        self.assertIs(job.portfolio, current)
+        np.testing.assert_allclose(job.surface.values, expected(self.positions, dates, spots),
+                                   rtol=1e-12, atol=1e-9)
+        self.assertEqual(self.done[-1].job_id, 'moved')
+
+    def test_jobs_finishing_out_of_order_both_succeed(self):
+        base = parse_positions(book(6))
+        wait(self.queue, self.queue.submit(base))
+        # A adds legs and has to price them, B only drops a row and finishes first
+        grown = parse_positions(book(6) + [dict(row, K=row['K'] + 1) for row in book(40)])
+        shrunk = base.drop(index=1).reset_index(drop=True)
+        a, b = self.queue.submit(grown), self.queue.submit(shrunk)
+        self.assertEqual(wait(self.queue, b)['state'], 'done')
+        self.assertEqual(wait(self.queue, a)['state'], 'done', self.queue.status(a)['error'])
+        for job_id, positions in ((a, grown), (b, shrunk)):
+            surface = self.queue.pop(job_id)
+            np.testing.assert_allclose(surface.values, expected(positions, surface.dates, surface.spots),
+                                       rtol=1e-12, atol=1e-9)
+
+    def test_grid_is_the_books_own(self):
+        wide = parse_positions(book(6) + [dict(ROW, S=400, expDate=20211217)])
+        wait(self.queue, self.queue.submit(wide))
+        job_id = self.queue.submit(self.positions)
+        self.assertEqual(wait(self.queue, job_id)['state'], 'done')
+        surface = self.queue.pop(job_id)
+        dates, spots = portfolio_grid(self.positions)
+        np.testing.assert_array_equal(surface.dates, dates)
+        np.testing.assert_array_equal(surface.spots, spots)
+
+    def test_dead_pool_process_fails_its_job_only(self):
+        wait(self.queue, self.queue.submit(self.positions.iloc[:1]))
+        # The job's chunks queue behind a task that kills the pool process
+        self.queue._pool().submit(die)
+        dying = self.queue.submit(parse_positions(book(40)))
+        self.assertEqual(wait(self.queue, dying)['state'], 'failed')
+        self.assertIn('pricing process died', self.queue.status(dying)['error'])
+        job_id = self.queue.submit(self.positions)
+        self.assertEqual(wait(self.queue, job_id)['state'], 'done', self.queue.status(job_id)['error'])
+        surface = self.queue.pop(job_id)
+        np.testing.assert_allclose(surface.values, expected(self.positions, surface.dates, surface.spots),
+                                   rtol=1e-12, atol=1e-9)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import metrics
+from data.result_cache import ResultCache
+
+
+def snapshot(latency, hits, entries):
+    return {'latency': {'graph': {'buckets': latency, 'sum': 1.5, 'count': sum(latency)}}, 'bytes': {},
+            'exceptions': {'graph|PreventUpdate': 1},
+            'caches': {'results': {'hits': hits, 'misses': 1, 'entries': entries}}}
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+class TestRender(unittest.TestCase):
+
+    def test_cumulative_buckets_and_labels(self):
+        cache = ResultCache()
+        cache.get('a', lambda: 1)
+        cache.get('a', lambda: 1)
+        m = metrics.CallbackMetrics(caches={'results': cache})
+        for seconds in (0.0005, 0.003, 0.004, 20.0):
+            m.observe_latency('graph', seconds)
+        m.count_exception('graph', 'PreventUpdate')
+        lines = m.render().splitlines()
+        bucket = 'dash_callback_duration_seconds_bucket{{callback="graph",le="{}"}} {}'
+        for le, n in (('0.001', 1), ('0.0025', 1), ('0.005', 3), ('10.0', 3), ('+Inf', 4)):
+            self.assertIn(bucket.format(le, n), lines)
+        self.assertEqual(len([l for l in lines if l.startswith('dash_callback_duration_seconds_bucket')]),
+                         len(metrics.LATENCY_BUCKETS) + 1)
+        self.assertIn('dash_callback_duration_seconds_count{callback="graph"} 4', lines)
+        self.assertIn('dash_callback_duration_seconds_sum{callback="graph"} 20.0075', lines)
+        self.assertIn('dash_callback_exceptions_total{callback="graph",exception="PreventUpdate"} 1', lines)
+        self.assertIn('dash_cache_hits_total{cache="results"} 1', lines)
+        self.assertIn('dash_cache_hit_ratio{cache="results"} 0.5', lines)
+        self.assertIn('# TYPE dash_callback_duration_seconds histogram', lines)
+
+
+class TestCollect(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, pid, state, age=0.0):
+        path = os.path.join(self.dir, '{}.json'.format(pid))
+        with open(path, 'w') as f:
+            json.dump(state, f)
+        if age:
+            stamp = os.path.getmtime(path) - age
+            os.utime(path, (stamp, stamp))
+        return path
+
+    def test_merge_sums_snapshots(self):
+        total = {'latency': {}, 'bytes': {}, 'exceptions': {}, 'caches': {}}
+        metrics._merge(total, snapshot([1, 0, 2], 3, 10))
+        metrics._merge(total, snapshot([0, 4, 1], 5, 7))
+        self.assertEqual(total['latency']['graph'], {'buckets': [1, 4, 3], 'sum': 3.0, 'count': 8})
+        self.assertEqual(total['exceptions'], {'graph|PreventUpdate': 2})
+        self.assertEqual(total['caches']['results'], {'hits': 8, 'misses': 2, 'entries': 17})
+
+    def test_dead_and_stale_processes_left_out(self):
+        m = metrics.CallbackMetrics(directory=self.dir)
+        self.write(os.getppid(), snapshot([1, 0, 2], 3, 10))
+        dead = self.write(dead_pid(), snapshot([5, 5, 5], 100, 1000))
+        idle = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+        self.addCleanup(idle.wait)
+        self.addCleanup(idle.kill)
+        stale = self.write(idle.pid, snapshot([7, 7, 7], 50, 500), age=2 * metrics.STALE_AFTER)
+        total = m.collect()
+        self.assertEqual(total['caches']['results']['entries'], 10)
+        self.assertEqual(total['latency']['graph']['count'], 3)
+        self.assertFalse(os.path.exists(dead))
+        self.assertTrue(os.path.exists(stale))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import numpy as np
+from data.portfolio import (PortfolioSurface, parse_positions, parse_row, portfolio_grid, portfolio_key,
+                            price_position)
+
+ROW = {'type': 'Call', 'evalDate': 20200511, 'expDate': 20201212, 'K': 280, 'S': 280, 'r': 5, 'Q': 5,
+       'price': 26.912}
+
+
+def book(n=6):
+    return [dict(ROW, type='Put' if i % 2 else 'Call', K=260 + 10 * i, expDate=20201212 - 100 * (i % 3))
+            for i in range(n)]
+
+
+class TestParsePositions(unittest.TestCase):
+
+    def test_sample_row(self):
+        positions = parse_positions([ROW])
+        self.assertEqual(len(positions), 1)
+        self.assertEqual(positions['flag'][0], 'c')
+        self.assertAlmostEqual(positions['r'][0], 0.05)
+        self.assertTrue(0 < positions['sigma'][0] < 1)
+
+    def test_invalid_rows_are_skipped_and_reported(self):
+        bad = [dict(ROW, evalDate='2020-05-11'), dict(ROW, K='abc'), dict(ROW, type='Straddle'),
+               dict(ROW, evalDate=20201212), dict(ROW, K=''), dict(ROW, S=-1)]
+        errors = []
+        positions = parse_positions(bad + [{}, {c: '' for c in ROW}, ROW], errors)
+        self.assertEqual(len(positions), 1)
+        self.assertEqual([e.split(':')[0] for e in errors], ['row {}'.format(i) for i in range(1, 7)])
+        self.assertIn('evalDate must be YYYYMMDD', errors[0])
+        self.assertIn('type must be Call or Put', errors[2])
+        self.assertIn('expDate must be after evalDate', errors[3])
+        self.assertIn('missing K', errors[4])
+
+    def test_parse_row_flags(self):
+        for text, flag in (('Call', 'c'), ('c', 'c'), (' PUT ', 'p'), ('p', 'p')):
+            self.assertEqual(parse_row(dict(ROW, type=text))['flag'], flag)
+
+    def test_no_positions(self):
+        errors = []
+        self.assertTrue(parse_positions([dict(ROW, expDate=20200101)], errors).empty)
+        self.assertEqual(len(errors), 1)
+
+
+class TestPortfolioSurface(unittest.TestCase):
+
+    def test_incremental_matches_full(self):
+        positions = parse_positions(book())
+        dates, spots = portfolio_grid(positions)
+        portfolio = PortfolioSurface(dates, spots)
+        portfolio.update(positions.iloc[:4])
+        store = portfolio.update(positions.iloc[2:])
+        expected = sum(price_position(p, dates, spots) for _, p in positions.iloc[2:].iterrows())
+        np.testing.assert_allclose(store.values, expected, rtol=1e-12, atol=1e-9)
+
+    def test_key_ignores_row_order(self):
+        positions = parse_positions(book())
+        self.assertEqual(portfolio_key(positions), portfolio_key(positions.iloc[::-1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import numpy as np
+from data.pricer import GREEKS, black_scholes_grid
+
+try:
+    from py_vollib.black_scholes_merton import black_scholes_merton
+    from py_vollib.black_scholes_merton.greeks import analytical
+except ImportError:
+    analytical = None
+
+RTOL = 1e-9
+ATOL = 1e-10
+
+
+@unittest.skipIf(analytical is None, 'needs py_vollib')
+class TestBlackScholesGrid(unittest.TestCase):
+    ''' black_scholes_grid against py_vollib's scalar Black-Scholes-Merton '''
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        n = 500
+        self.S = rng.uniform(50, 500, n)
+        self.K = self.S * rng.uniform(0.5, 1.5, n)
+        self.t = rng.uniform(1 / 365, 3, n)
+        self.r = rng.uniform(-0.01, 0.08, n)
+        self.sigma = rng.uniform(0.05, 1.0, n)
+        self.q = rng.uniform(0, 0.05, n)
+
+    def _check(self, flag):
+        grid = black_scholes_grid(flag, self.S, self.K, self.t, self.r, self.sigma, self.q)
+        scalar = {'value': black_scholes_merton, 'delta': analytical.delta, 'gamma': analytical.gamma,
+                  'theta': analytical.theta, 'vega': analytical.vega}
+        for greek in GREEKS:
+            expected = [scalar[greek](flag, S, K, t, r, sigma, q)
+                        for S, K, t, r, sigma, q in zip(self.S, self.K, self.t, self.r, self.sigma, self.q)]
+            np.testing.assert_allclose(grid[greek], expected, rtol=RTOL, atol=ATOL, err_msg=greek)
+
+    def test_calls(self):
+        self._check('c')
+
+    def test_puts(self):
+        self._check('p')
+
+    def test_broadcast(self):
+        # A (spot x t) grid priced in one pass equals pricing every point on its own
+        spots = np.linspace(80, 120, 7)[:, np.newaxis]
+        t = np.array([0.1, 0.5, 1.0])[np.newaxis, :]
+        grid = black_scholes_grid('c', spots, 100.0, t, 0.02, 0.25, 0.01)
+        for i in range(spots.shape[0]):
+            for j in range(t.shape[1]):
+                point = black_scholes_grid('c', spots[i, 0], 100.0, t[0, j], 0.02, 0.25, 0.01)
+                for greek in GREEKS:
+                    self.assertAlmostEqual(grid[greek][i, j], float(point[greek]), places=12)
+
+
+if __name__ == '__main__':
+    unittest.main()
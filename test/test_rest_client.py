@@ -0,0 +1,76 @@
+import socket
+import unittest
+from unittest import mock
+import numpy as np
+from data import rest_client
+from data.jobs import JobQueue
+from data.portfolio import parse_positions, portfolio_grid, price_positions
+from test.test_jobs import expected, wait
+from test.test_portfolio import book
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@unittest.skipIf(rest_client.aiohttp is None, 'needs aiohttp')
+class TestRestPricer(unittest.TestCase):
+
+    def setUp(self):
+        from data.rest_stub import stub_server
+        self.server = stub_server()
+        self.url = self.server.__enter__()
+        self.pricer = rest_client.RestPricer(self.url, batch_legs=4, max_in_flight=2)
+        self.positions = parse_positions(book(10))
+        self.dates, self.spots = portfolio_grid(self.positions)
+
+    def tearDown(self):
+        self.pricer.close()
+        self.server.__exit__(None, None, None)
+
+    def test_matches_price_positions(self):
+        priced = self.pricer(self.positions, self.dates, self.spots)
+        local = price_positions(self.positions, self.dates, self.spots)
+        self.assertEqual(set(priced), set(local))
+        for key in local:
+            np.testing.assert_allclose(priced[key], local[key], rtol=1e-12, atol=1e-9)
+
+    def test_session_kept_between_calls(self):
+        self.pricer(self.positions.iloc[:3], self.dates, self.spots)
+        session = self.pricer._session
+        self.pricer(self.positions.iloc[3:], self.dates, self.spots)
+        self.assertIs(self.pricer._session, session)
+        self.assertFalse(session.closed)
+        self.pricer.close()
+        self.assertTrue(session.closed)
+
+    def test_job_queue_sends_whole_job_in_one_call(self):
+        pricer = mock.Mock(wraps=self.pricer)
+        queue = JobQueue(pricer=pricer)
+        job_id = queue.submit(self.positions)
+        self.assertEqual(wait(queue, job_id)['state'], 'done')
+        surface = queue.pop(job_id)
+        np.testing.assert_allclose(surface.values, expected(self.positions, surface.dates, surface.spots),
+                                   rtol=1e-12, atol=1e-9)
+        self.assertEqual(pricer.call_count, 1)
+        self.assertEqual(len(pricer.call_args[0][0]), len(self.positions))
+
+    def test_errors(self):
+        down = rest_client.RestPricer('http://127.0.0.1:{}'.format(free_port()), retries=0)
+        try:
+            with self.assertRaises(RuntimeError):
+                down(self.positions, self.dates, self.spots)
+        finally:
+            down.close()
+        missing = rest_client.RestPricer(self.url + '/nowhere')
+        try:
+            with self.assertRaisesRegex(RuntimeError, 'HTTP 404'):
+                missing(self.positions, self.dates, self.spots)
+        finally:
+            missing.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+import unittest
+from data.result_cache import ResultCache
+
+
+class TestResultCache(unittest.TestCase):
+
+    def test_least_recently_used_evicted(self):
+        cache = ResultCache(max_entries=2)
+        cache.get('a', lambda: 1)
+        cache.get('b', lambda: 2)
+        cache.get('a', lambda: None)
+        cache.get('c', lambda: 3)
+        self.assertEqual(cache.get('a', lambda: 'recomputed'), 1)
+        self.assertEqual(cache.get('b', lambda: 'recomputed'), 'recomputed')
+
+    def test_none_is_not_stored(self):
+        cache = ResultCache()
+        self.assertIsNone(cache.get('surface', lambda: None))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.get('surface', lambda: 'priced'), 'priced')
+
+
+if __name__ == '__main__':
+    unittest.main()
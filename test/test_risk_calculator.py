@@ -0,0 +1,44 @@
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from data.portfolio import parse_positions, price_position
+from data.risk_calculator import book_grid, generate_book_surface
+from data.surface_store import SurfaceStore
+from test.test_portfolio import ROW, book
+
+
+def multi_underlying_book():
+    rows = [dict(row, underlying='SPX') for row in book(7)]
+    rows += [dict(row, underlying='NDX', S=row['S'] * 40, K=row['K'] * 40, price=row['price'] * 40) for row in book(5)]
+    rows += [dict(ROW, underlying='RUT', S=150, K=155, price=8.0, expDate=20210319)]
+    return parse_positions(rows)
+
+
+def serial_sum(positions, dates, moves):
+    return sum(price_position(p, dates, p['S'] * (1 + moves / 100.0)) for _, p in positions.iterrows())
+
+
+class TestBookSurface(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_matches_serial_sum(self):
+        positions = multi_underlying_book()
+        dates, moves = book_grid(positions)
+        expected = serial_sum(positions, dates, moves)
+        for workers in (1, 3):
+            path = '{}/book{}.surface'.format(self.dir, workers)
+            generate_book_surface(positions, path, workers=workers)
+            store = SurfaceStore.load(path)
+            np.testing.assert_array_equal(store.dates, dates)
+            np.testing.assert_array_equal(store.spots, moves)
+            np.testing.assert_allclose(store.values, expected, rtol=1e-12, atol=1e-8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from data.shared_cache import SCAN_EVERY, FileCache, content_key
+from data.surface_store import SurfaceStore
+
+
+def dense_store(seed=0, n_dates=6, n_spots=9):
+    values = np.random.RandomState(seed).normal(size=(n_dates, 3, n_spots))
+    return SurfaceStore(values, np.arange(737000, 737000 + n_dates), ['delta', 'gamma', 'value'],
+                        np.arange(100, 100 + n_spots))
+
+
+class TestFileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_shared_between_instances(self):
+        a, b = FileCache(self.dir), FileCache(self.dir)
+        a.put(('figure', 1), {'x': [1, 2]})
+        self.assertEqual(b.peek(('figure', 1)), {'x': [1, 2]})
+        a.put_surface('book', dense_store())
+        np.testing.assert_array_equal(b.surface('book').values, dense_store().values)
+        self.assertIsNone(b.surface('other'))
+
+    def test_surface_outlives_eviction_by_another_instance(self):
+        a, b = FileCache(self.dir), FileCache(self.dir, max_bytes=1)
+        a.put_surface('book', dense_store())
+        store = a.surface('book')
+        b.put(('figure', 1), list(range(10)))
+        self.assertIsNone(a.surface('book'))
+        for plot_type in store.plot_types * 2:
+            np.testing.assert_array_equal(store.greek(plot_type), dense_store().greek(plot_type))
+
+    def test_puts_do_not_rescan_every_time(self):
+        cache = FileCache(self.dir)
+        with mock.patch.object(FileCache, '_evict', autospec=True, side_effect=FileCache._evict) as evict:
+            for i in range(2 * SCAN_EVERY):
+                cache.put(('figure', i), list(range(10)))
+        # The first put measures the directory, then one rescan per SCAN_EVERY puts
+        self.assertEqual(evict.call_count, 3)
+
+    def test_least_recently_used_evicted_past_max_bytes(self):
+        cache = FileCache(self.dir, max_bytes=10 ** 6)
+        blob = np.zeros(30000)
+        for i in range(3):
+            cache.put(i, blob)
+            os.utime(cache._path(i, '.pkl'), (1000 + i, 1000 + i))
+        cache.peek(0)
+        cache.put(3, blob)
+        cache.put(4, blob)
+        self.assertIsNotNone(cache.peek(0))
+        self.assertIsNone(cache.peek(1))
+        self.assertLessEqual(sum(os.path.getsize(os.path.join(self.dir, f)) for f in os.listdir(self.dir)),
+                             10 ** 6)
+
+
+class TestContentKey(unittest.TestCase):
+
+    def test_equal_content_equal_key(self):
+        self.assertEqual(content_key(dense_store()), content_key(dense_store()))
+        self.assertNotEqual(content_key(dense_store()), content_key(dense_store(seed=1)))
+
+    def test_bundle_key_read_from_meta(self):
+        directory = tempfile.mkdtemp()
+        try:
+            dense_store().save(os.path.join(directory, 'bundle'))
+            lazy = SurfaceStore.load(os.path.join(directory, 'bundle'))
+            self.assertEqual(content_key(lazy), content_key(dense_store()))
+            self.assertEqual(lazy.loaded, [])
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+from datetime import date
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import numpy as np
+from sqlalchemy import inspect
+from data.sql import GREEK_COLUMNS, bulk_insert_surface, create_sqlite_engine, read_date_slice
+from data.surface_store import SurfaceStore
+
+EXPIRY = date(2020, 12, 18)
+
+# Options as created before the spot column and the slice index were added
+OLD_SCHEMA = '''
+CREATE TABLE "Assets" (id INTEGER NOT NULL PRIMARY KEY, asset_name VARCHAR(20) NOT NULL,
+                       ticker VARCHAR(10) NOT NULL);
+CREATE TABLE "Options" (id INTEGER NOT NULL PRIMARY KEY, asset_id INTEGER REFERENCES "Assets" (id),
+                        current_date DATETIME NOT NULL, expiry_date DATETIME NOT NULL,
+                        multiplier INTEGER NOT NULL, day_count FLOAT NOT NULL, delta FLOAT NOT NULL,
+                        gamma FLOAT NOT NULL, theta FLOAT NOT NULL, vega FLOAT NOT NULL,
+                        present_value FLOAT NOT NULL);
+INSERT INTO "Assets" VALUES (1, 'S&P 500', 'SPX');
+'''
+
+
+def store_with_holes():
+    dates = np.arange(date(2020, 5, 11).toordinal(), date(2020, 5, 16).toordinal())
+    spots = np.arange(270, 290)
+    values = np.random.RandomState(0).normal(size=(len(dates), len(GREEK_COLUMNS), len(spots)))
+    values[1, 2, 3] = np.nan
+    values[4, :, 5:8] = np.nan
+    return SurfaceStore(values, dates, list(GREEK_COLUMNS), spots)
+
+
+class TestSql(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'options.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_old_schema_is_migrated(self):
+        with sqlite3.connect(self.path) as conn:
+            conn.executescript(OLD_SCHEMA)
+        engine = create_sqlite_engine(self.path)
+        inspector = inspect(engine)
+        self.assertIn('spot', [c['name'] for c in inspector.get_columns('Options')])
+        self.assertEqual([i['column_names'] for i in inspector.get_indexes('Options')],
+                         [['asset_id', 'current_date', 'expiry_date']])
+        # Running it again on a migrated database changes nothing
+        create_sqlite_engine(self.path)
+        engine.dispose()
+
+    def test_nan_cells_are_skipped(self):
+        engine = create_sqlite_engine(self.path)
+        store = store_with_holes()
+        written = bulk_insert_surface(engine, 1, store, EXPIRY)
+        self.assertEqual(written, store.values[:, 0].size - 1 - 3)
+        day = date.fromordinal(int(store.dates[4]))
+        frame = read_date_slice(engine, 1, day)
+        self.assertEqual(frame['spot'].tolist(), [float(s) for s in np.delete(store.spots, [5, 6, 7])])
+        np.testing.assert_array_equal(frame['delta'].values, np.delete(store.greek('delta')[4], [5, 6, 7]))
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from data.result_cache import ResultCache, approx_nbytes
+from data.surface_store import (SurfaceStore, bundle_path, fallback_path, is_fresh, load_surface,
+                                read_surface_csv)
+
+
+def write_csv(path, n_dates=5, n_spots=7, seed=0):
+    rng = np.random.RandomState(seed)
+    dates = pd.date_range('2020-05-11', periods=n_dates).date
+    rows = [(d, s, p, rng.normal()) for d in dates for s in range(100, 100 + n_spots)
+            for p in ('delta', 'gamma', 'value')]
+    pd.DataFrame(rows, columns=['date', 'spot', 'plot_type', 'value']).to_csv(path, index=False)
+
+
+def boot(csv, path):
+    # A worker start up: load the surface and read every greek
+    store = load_surface(csv, path=path)
+    return float(sum(np.nansum(store.greek(p)) for p in store.plot_types))
+
+
+class TestLoadSurface(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.tempdir = tempfile.tempdir
+        tempfile.tempdir = os.path.join(self.dir, 'tmp')
+        os.makedirs(tempfile.tempdir)
+        self.csv = os.path.join(self.dir, 'surface.csv')
+        write_csv(self.csv)
+
+    def tearDown(self):
+        tempfile.tempdir = self.tempdir
+        shutil.rmtree(self.dir)
+
+    def test_bundle_survives_touch(self):
+        load_surface(self.csv)
+        stamp = os.path.getmtime(bundle_path(self.csv))
+        os.utime(self.csv, (time.time() + 60, time.time() + 60))
+        self.assertTrue(is_fresh(bundle_path(self.csv), self.csv))
+        load_surface(self.csv)
+        self.assertEqual(os.path.getmtime(bundle_path(self.csv)), stamp)
+
+    def test_bundle_rebuilt_on_edit(self):
+        load_surface(self.csv)
+        write_csv(self.csv, seed=1)
+        self.assertFalse(is_fresh(bundle_path(self.csv), self.csv))
+        store = load_surface(self.csv)
+        np.testing.assert_array_equal(store.values, SurfaceStore.from_frame(pd.read_csv(self.csv)).values)
+
+    def test_same_bundle_already_in_place_is_kept(self):
+        load_surface(self.csv)
+        path = bundle_path(self.csv)
+        inode = os.stat(path).st_ino
+        read_surface_csv(self.csv).save(path, source=self.csv)
+        self.assertEqual(os.stat(path).st_ino, inode)
+        self.assertEqual(sorted(os.listdir(self.dir)), ['surface.csv', 'surface.surface', 'tmp'])
+
+    def test_bundle_replaced_before_load_is_looked_up_again(self):
+        load_surface(self.csv)
+        real, calls = SurfaceStore.load, []
+
+        def replaced_once(path):
+            calls.append(path)
+            if len(calls) == 1:
+                raise FileNotFoundError(os.path.join(path, 'values_0.npy'))
+            return real(path)
+        with mock.patch.object(SurfaceStore, 'load', side_effect=replaced_once):
+            store = load_surface(self.csv)
+        self.assertEqual(len(calls), 2)
+        np.testing.assert_array_equal(store.values, read_surface_csv(self.csv).values)
+
+    def test_workers_booting_on_stale_bundle(self):
+        path = bundle_path(self.csv)
+        with ProcessPoolExecutor(max_workers=4) as pool:
+            for seed in range(1, 6):
+                write_csv(self.csv, n_dates=40, n_spots=300, seed=seed)
+                expected = float(np.nansum(read_surface_csv(self.csv).values))
+                results = list(pool.map(boot, [self.csv] * 4, [path] * 4))
+                np.testing.assert_allclose(results, expected)
+                self.assertTrue(is_fresh(path, self.csv))
+
+    def test_read_only_falls_back_to_tempdir(self):
+        # A path below a regular file can never be created, like a read only deployment
+        blocked = os.path.join(self.csv, 'surface.surface')
+        store = load_surface(self.csv, path=blocked)
+        self.assertTrue(is_fresh(fallback_path(self.csv), self.csv))
+        self.assertEqual(store.loaded, [])
+        again = load_surface(self.csv, path=blocked)
+        np.testing.assert_array_equal(again.values, store.values)
+
+
+class TestSurfaceStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        csv = os.path.join(self.dir, 'surface.csv')
+        write_csv(csv)
+        self.dense = SurfaceStore.from_frame(pd.read_csv(csv))
+        self.dense.save(os.path.join(self.dir, 'bundle'))
+        self.lazy = SurfaceStore.load(os.path.join(self.dir, 'bundle'))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_lazy_matches_dense(self):
+        np.testing.assert_array_equal(self.lazy.values, self.dense.values)
+        np.testing.assert_array_equal(self.lazy.dates, self.dense.dates)
+        start, end = int(self.dense.dates[1]), int(self.dense.dates[-1])
+        for plot_type in self.dense.plot_types:
+            for a, b in zip(self.lazy.start_end(plot_type, start, end), self.dense.start_end(plot_type, start, end)):
+                np.testing.assert_array_equal(a, b)
+
+    def test_working_set(self):
+        for plot_type in self.lazy.plot_types:
+            self.lazy.greek(plot_type)
+        self.assertEqual(self.lazy.loaded, self.lazy.plot_types[-self.lazy.max_greeks:])
+
+    def test_survives_bundle_removal(self):
+        shutil.rmtree(os.path.join(self.dir, 'bundle'))
+        for plot_type in self.dense.plot_types + self.dense.plot_types:
+            np.testing.assert_array_equal(self.lazy.greek(plot_type), self.dense.greek(plot_type))
+
+    def test_nbytes(self):
+        self.assertEqual(approx_nbytes(self.dense), self.dense.values.nbytes)
+        self.assertEqual(approx_nbytes(self.lazy), 0)
+        cache = ResultCache(max_bytes=self.dense.values.nbytes)
+        cache.get('a', lambda: self.dense)
+        cache.get('b', lambda: self.dense)
+        self.assertEqual(len(cache), 1)
+
+    def test_row_off_surface_is_nan(self):
+        self.assertTrue(np.isnan(self.dense.row('delta', int(self.dense.dates[-1]) + 1)).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import calendar
+from datetime import date, timedelta
+import unittest
+import numpy as np
+from utils import getMarks, month_ends
+
+
+def legacy_marks(start_date, end_date):
+    ''' getMarks as it was before month_ends: a walk over every day of the range '''
+    start, end = start_date.toordinal(), end_date.toordinal()
+    result = {}
+    for i in range(start, end + 1):
+        day = date.fromordinal(i)
+        month_end = calendar.monthrange(day.year, day.month)[1] == day.day
+        if i == start or i == end or (start + 14 <= i <= end - 14 and month_end):
+            result[i] = {'label': day.strftime('%d\u00a0%b\u00a0%y'),
+                         'style': {'text-align': 'center', 'margin': 'auto'}}
+    return result
+
+
+class TestMarks(unittest.TestCase):
+
+    def test_matches_daily_walk(self):
+        rng = np.random.RandomState(0)
+        for _ in range(2000):
+            start = date(2000, 1, 1) + timedelta(days=int(rng.randint(0, 9000)))
+            end = start + timedelta(days=int(rng.choice([0, 1, 13, 14, 28, 29, 45, 400, 3000])))
+            self.assertEqual(getMarks(start, end), legacy_marks(start, end), (start, end))
+
+    def test_month_ends(self):
+        ordinals = month_ends(date(2020, 1, 31), date(2020, 3, 30))
+        self.assertEqual([date.fromordinal(int(o)) for o in ordinals], [date(2020, 1, 31), date(2020, 2, 29)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+from datetime import date
+import unittest
+import numpy as np
+import pandas as pd
+import views
+from data.surface_store import SurfaceStore
+
+
+def store(n_dates=8, n_spots=40, first_spot=195, seed=0):
+    rng = np.random.RandomState(seed)
+    dates = np.arange(date(2020, 5, 11).toordinal(), date(2020, 5, 11).toordinal() + n_dates)
+    values = rng.normal(scale=100, size=(n_dates, 3, n_spots))
+    values[rng.rand(*values.shape) < 0.05] = np.nan
+    return SurfaceStore(values, dates, ['value', 'delta', 'gamma'], np.arange(first_spot, first_spot + n_spots))
+
+
+def pivot_records(surface, start, end, input_gap):
+    ''' performance_table records as the pivot_table of the long format frame built them '''
+    idx = [surface.date_index[o] for o in sorted({start, end}) if o in surface.date_index]
+    frame = pd.DataFrame([(date.fromordinal(int(surface.dates[i])).isoformat(), p, int(s), v)
+                          for i in idx for p in surface.plot_types
+                          for s, v in zip(surface.spots, surface.greek(p)[i])],
+                         columns=['date', 'plot_type', 'spot', 'value'])
+    pt = frame.pivot_table(columns='spot', values='value', index=['date', 'plot_type'], dropna=False).reset_index()
+    spots = [s for s in surface.spots.tolist() if s % input_gap == 0]
+    return [dict({str(s): row[s] for s in spots}, date=row['date'], plot_type=row['plot_type'])
+            for row in pt.to_dict('records')]
+
+
+def same_records(a, b):
+    if len(a) != len(b):
+        return False
+    for x, y in zip(a, b):
+        if x.keys() != y.keys():
+            return False
+        for k in x:
+            both_nan = isinstance(x[k], float) and isinstance(y[k], float) and np.isnan(x[k]) and np.isnan(y[k])
+            if not both_nan and x[k] != y[k]:
+                return False
+    return True
+
+
+class TestPerformanceTable(unittest.TestCase):
+
+    def test_matches_pivot(self):
+        rng = np.random.RandomState(1)
+        for case in range(80):
+            surface = store(n_dates=int(rng.randint(1, 10)), n_spots=int(rng.randint(1, 60)),
+                            first_spot=int(rng.randint(1, 300)), seed=case)
+            first, last = int(surface.dates[0]), int(surface.dates[-1])
+            start, end = sorted(int(d) for d in rng.randint(first - 2, last + 3, size=2))
+            input_gap = int(rng.choice([1, 2, 5, 7, 10, 50]))
+            columns, data, styles = views.performance_table(surface, start, end, input_gap)
+            expected = pivot_records(surface, start, end, input_gap)
+            self.assertTrue(same_records(data, expected), (case, start, end, input_gap))
+            self.assertEqual([c['id'] for c in columns[2:]],
+                             [str(s) for s in surface.spots.tolist() if s % input_gap == 0])
+
+    def test_pages_and_windows_cover_full_table(self):
+        surface = store(n_spots=70)
+        start, end = int(surface.dates[1]), int(surface.dates[5])
+        full = views.performance_table(surface, start, end, 1)[1]
+        pages = [views.performance_table(surface, start, end, 1, page, 4, '', 0)[1] for page in range(2)]
+        self.assertEqual([(r['date'], r['plot_type']) for r in pages[0] + pages[1]],
+                         [(r['date'], r['plot_type']) for r in full])
+        windows = views.column_windows(surface, 1, width=25)
+        self.assertEqual(windows, ['195', '220', '245'])
+        labels = []
+        for window in range(len(windows) + 1):
+            columns = views.performance_table(surface, start, end, 1, 0, 6, '', window, width=25)[0]
+            labels.append([c['id'] for c in columns[2:]])
+        self.assertEqual(sum(labels[:3], []), [str(s) for s in surface.spots.tolist()])
+        # A window past the last one shows the last one
+        self.assertEqual(labels[3], labels[2])
+
+    def test_filter(self):
+        surface = store()
+        start, end = int(surface.dates[0]), int(surface.dates[3])
+        data = views.performance_table(surface, start, end, 5, filter_query='{plot_type} = delta && {200} > 0')
+        expected = [r for r in views.performance_table(surface, start, end, 5)[1]
+                    if r['plot_type'] == 'delta' and r['200'] > 0]
+        self.assertEqual(data[1], expected)
+        self.assertTrue(data[1])
+        self.assertEqual(views.performance_table(surface, start, end, 5, filter_query='{date} contains 05-14')[1],
+                         [r for r in views.performance_table(surface, start, end, 5)[1] if r['date'] == '2020-05-14'])
+        self.assertEqual(views.parse_filter('{200} >= "1.5" && nonsense'), [('200', 'ge', '1.5')])
+
+
+if __name__ == '__main__':
+    unittest.main()
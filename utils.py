@@ -0,0 +1,42 @@
+import calendar
+from datetime import date
+from functools import lru_cache
+import numpy as np
+from data.surface_store import EPOCH_ORDINAL
+
+
+def date_to_int(input_date):
+    ''' Convert datetime to ordinal timestamp '''
+    return input_date.toordinal()
+
+
+def check_month_end(input_date):
+    ''' Check if input date is the last day of month '''
+    if calendar.monthrange(input_date.year, input_date.month)[1] == input_date.day:
+        return True
+    else:
+        return False
+
+
+def month_ends(start_date, end_date):
+    ''' Ordinals of every month end between start_date and end_date inclusive '''
+    months = np.arange(np.datetime64(start_date, 'M'), np.datetime64(end_date, 'M') + 1)
+    ordinals = ((months + 1).astype('datetime64[D]') - 1).astype(np.int64) + EPOCH_ORDINAL
+    return ordinals[(ordinals >= date_to_int(start_date)) & (ordinals <= date_to_int(end_date))]
+
+
+@lru_cache(maxsize=32)
+def getMarks(start_date, end_date, spacing=30):
+    ''' Returns the marks for labeling.
+        The range ends plus every month end at least 14 days inside them, cached per range,
+        so the returned dict is shared and must not be modified.
+    '''
+    start, end = date_to_int(start_date), date_to_int(end_date)
+    inner = month_ends(start_date, end_date)
+    inner = inner[(inner >= start + 14) & (inner <= end - 14)].tolist()
+    result = {}
+    for i in [start] + inner + [end]:
+        result[i] = {'label': date.fromordinal(i).strftime('%d %b %y'),
+                     'style': {'text-align': 'center',
+                               'margin': 'auto'}}
+    return result
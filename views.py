@@ -0,0 +1,247 @@
+import base64
+import copy
+from datetime import date
+import re
+import numpy as np
+from dash_table.Format import Format, Scheme, Sign
+from data.decimate import decimate
+
+# Points sent per trace, roughly one per horizontal pixel of graph_dynamic
+MAX_GRAPH_POINTS = 1000
+# Spot columns in one window of the server side performance_table
+TABLE_COLUMNS = 25
+# A term of a DataTable filter_query, two character operators tried before their prefixes
+FILTER_TERM = re.compile(r'^\{(?P<column>[^}]+)\}\s*(?P<operator>>=|<=|!=|<|>|=|ge|le|ne|lt|gt|eq|contains|'
+                         r'datestartswith)\s*(?P<value>.*)$')
+
+layout = dict(
+    autosize=True,
+    automargin=True,
+    margin=dict(l=30, r=30, b=20, t=40),
+    hovermode="closest",
+    plot_bgcolor="#F9F9F9",
+    paper_bgcolor="#F9F9F9",
+    legend=dict(font=dict(size=10), orientation="h"),
+    title="Satellite Overview"
+)
+
+
+def _spot_layout():
+    layout_main_graph = copy.deepcopy(layout)
+    layout_main_graph['title'] = 'Graph vs spot'
+    layout_main_graph["showlegend"] = True
+    layout_main_graph["autosize"] = True
+    layout_main_graph["hovermode"] = 'compare'
+    return layout_main_graph
+
+
+def spot_figure(surface, y_axis, start, end, max_points=MAX_GRAPH_POINTS):
+    ''' Figure comparing the start and end date slices of one plot_type against spot.
+        Each trace is min/max decimated to max_points so the payload is bounded by the graph
+        width rather than by the spot grid.
+    '''
+    spots = surface.spots
+    value_start, value_end = surface.start_end(y_axis, start, end)
+    x_diff, y_diff = decimate(spots, (value_start - value_end).astype(int), max_points)
+    x_start, y_start = decimate(spots, value_start, max_points)
+    x_end, y_end = decimate(spots, value_end, max_points)
+
+    data = [
+        dict(
+            type='bar',
+            x=x_diff,
+            y=y_diff,
+            name='Start-End',
+            marker=dict(color="rgb(123, 199, 255)"),
+        ),
+        dict(
+            x=x_start,
+            y=y_start,
+            mode='lines',
+            name='Start',
+        ),
+        dict(
+            x=x_end,
+            y=y_end,
+            mode='lines',
+            name='End',
+        ),
+    ]
+    figure = dict(data=data, layout=_spot_layout())
+    return figure
+
+
+def scenario_heatmap(pnl, spot_shocks, vol_shocks, on_date):
+    ''' Heatmap of a scenario_ladder P&L with spot moves in % across and vol moves in vol points up '''
+    layout_heatmap = copy.deepcopy(layout)
+    layout_heatmap['title'] = 'P&L on {:%d-%b-%y} vs spot and vol'.format(on_date)
+    layout_heatmap['xaxis'] = dict(title='Spot move (%)')
+    layout_heatmap['yaxis'] = dict(title='Vol move (pts)')
+    data = [
+        dict(
+            type='heatmap',
+            x=np.round(np.asarray(spot_shocks) * 100, 2),
+            y=np.round(np.asarray(vol_shocks) * 100, 2),
+            z=pnl,
+            zmid=0,
+            colorscale='RdBu',
+            colorbar=dict(title='P&L'),
+        ),
+    ]
+    return dict(data=data, layout=layout_heatmap)
+
+
+def gap_columns(spots, input_gap):
+    ''' Positions of the spot columns shown at input_gap, the integer spots divisible by it.
+        A unit spaced integer axis is strided with a slice, anything else falls back to a mask.
+    '''
+    gap = int(input_gap)
+    spots = np.asarray(spots)
+    if spots.dtype.kind not in 'iu' or not len(spots):
+        return np.array([], dtype=np.int64)
+    if len(spots) == 1 or (np.diff(spots) == 1).all():
+        return np.arange((-spots[0]) % gap, len(spots), gap)
+    return np.flatnonzero(spots % gap == 0)
+
+
+def _table_columns(labels):
+    number = Format(nully='N/A', precision=2, scheme=Scheme.fixed, sign=Sign.parantheses)
+    return [{'id': 'date', 'name': 'date', 'type': 'text'}] + \
+           [{'id': 'plot_type', 'name': 'plot_type', 'type': 'text'}] + \
+           [{'id': label, 'name': label, 'type': 'numeric', 'format': number} for label in labels]
+
+
+def _table_styles(columns):
+    return [{'if': {'row_index': 'odd'}, 'backgroundColor': '#e2f2f6'}] + \
+           [{'if': {'column_id': col['id'], 'filter_query': '{}<0.0'.format("{" + col['id'] + "}")},
+             'color': 'red'}
+            for col in columns if col['type'] == 'numeric']
+
+
+def parse_filter(filter_query):
+    ''' (column, operator, value) terms of a DataTable filter_query, which joins them with &&.
+        Terms that do not parse are dropped, as the table drops an invalid filter.
+    '''
+    terms = []
+    for part in (filter_query or '').split(' && '):
+        match = FILTER_TERM.match(part.strip())
+        if match is None:
+            continue
+        operator = {'>=': 'ge', '<=': 'le', '!=': 'ne', '<': 'lt', '>': 'gt', '=': 'eq'}.get(
+            match.group('operator'), match.group('operator'))
+        value = match.group('value').strip()
+        if len(value) > 1 and value[0] == value[-1] and value[0] in '"\'`':
+            value = value[1:-1]
+        terms.append((match.group('column'), operator, value))
+    return terms
+
+
+def _compare(values, operator, value):
+    # values is an array of str (date, plot_type) or float64 (spot columns), NaN never matches
+    if operator == 'contains':
+        return np.array([value in str(v) for v in values], dtype=bool)
+    if operator == 'datestartswith':
+        return np.array([str(v).startswith(value) for v in values], dtype=bool)
+    compare = {'eq': np.equal, 'ne': np.not_equal, 'lt': np.less, 'le': np.less_equal,
+               'gt': np.greater, 'ge': np.greater_equal}[operator]
+    if values.dtype.kind != 'f':
+        return compare(values, value)
+    try:
+        value = float(value)
+    except ValueError:
+        return np.zeros(len(values), dtype=bool)
+    with np.errstate(invalid='ignore'):
+        return compare(values, value) & ~np.isnan(values)
+
+
+def _filter_rows(surface, rows, filter_query):
+    # rows are (date index, plot_type) pairs, each spot term reads one column of the store
+    for column, operator, value in parse_filter(filter_query):
+        if column == 'date':
+            values = np.array([date.fromordinal(int(surface.dates[i])).isoformat() for i, _ in rows])
+        elif column == 'plot_type':
+            values = np.array([p for _, p in rows])
+        else:
+            try:
+                position = int(np.searchsorted(surface.spots, float(column)))
+            except ValueError:
+                continue
+            if position == len(surface.spots) or str(surface.spots[position].item()) != column:
+                continue
+            values = np.array([surface.greek(p)[i, position] for i, p in rows], dtype=np.float64)
+        keep = _compare(values, operator, value)
+        rows = [row for row, k in zip(rows, keep) if k]
+    return rows
+
+
+def column_windows(surface, input_gap, width=TABLE_COLUMNS):
+    ''' Label of the first spot column of every window of width columns shown at input_gap '''
+    keep = gap_columns(surface.spots, input_gap)
+    return [str(s) for s in surface.spots[keep[::width]].tolist()]
+
+
+def performance_table(surface, start, end, input_gap, page_current=0, page_size=None, filter_query=None,
+                      window=None, width=TABLE_COLUMNS):
+    ''' Columns, records and conditional styles of the start/end table for every plot_type.
+        One row per (date, plot_type) in sorted order, read straight off the store's rows and
+        cut to the input_gap columns by gap_columns. For the custom paging and filtering mode of
+        the DataTable, rows can be limited to those passing filter_query and to one page of
+        page_size, and spot columns to the window-th group of width, so the payload does not
+        grow with the spot grid. The defaults give the whole table.
+    '''
+    keep = gap_columns(surface.spots, input_gap)
+    if window is not None:
+        window = min(max(int(window), 0), max((len(keep) - 1) // width, 0))
+        keep = keep[window * width:(window + 1) * width]
+    labels = [str(s) for s in surface.spots[keep].tolist()]
+    idx = sorted(surface.date_index[o] for o in {int(start), int(end)} if o in surface.date_index)
+    rows = _filter_rows(surface, [(i, p) for i in idx for p in sorted(surface.plot_types)], filter_query)
+    if page_size is not None:
+        first = int(page_current or 0) * int(page_size)
+        rows = rows[first:first + int(page_size)]
+    data = []
+    for i, p in rows:
+        record = dict(zip(labels, surface.greek(p)[i, keep].tolist()))
+        record['date'] = date.fromordinal(int(surface.dates[i])).isoformat()
+        record['plot_type'] = p
+        data.append(record)
+    columns = _table_columns(labels)
+    return columns, data, _table_styles(columns)
+
+
+def _typed_array(values):
+    # Little endian float64 bytes, read in the browser as a Float64Array
+    return base64.b64encode(np.ascontiguousarray(values, dtype='<f8').tobytes()).decode('ascii')
+
+
+def _date_axis(surface):
+    return {'dates': [int(d) for d in surface.dates],
+            'labels': [date.fromordinal(int(d)).isoformat() for d in surface.dates]}
+
+
+def spot_payload(surface, y_axis, max_points=MAX_GRAPH_POINTS):
+    ''' Every date of one plot_type for the clientside spot figure (assets/clientside.js).
+        values is the (date x spot) block as base64 float64, the browser slices the start and
+        end rows out of it on every slider move.
+    '''
+    payload = _date_axis(surface)
+    payload.update(plot_type=y_axis, max_points=max_points, layout=_spot_layout(),
+                   spots=[s.item() for s in surface.spots],
+                   values=_typed_array(surface.greek(y_axis)))
+    return payload
+
+
+def table_payload(surface, input_gap):
+    ''' Every date and plot_type on the spot columns shown at input_gap for the clientside
+        performance table, with the columns and styles that do not depend on the date range.
+        values is the (date x plot_type x spot) block as base64 float64, plot_types in the
+        order the server side pivot sorts them.
+    '''
+    plot_types = sorted(surface.plot_types)
+    keep = gap_columns(surface.spots, input_gap)
+    labels = [str(s) for s in surface.spots[keep].tolist()]
+    columns = _table_columns(labels)
+    values = np.stack([surface.greek(p)[:, keep] for p in plot_types], axis=1)
+    payload = _date_axis(surface)
+    payload.update(plot_types=plot_types, spots=labels, values=_typed_array(values))
+    return payload, columns, _table_styles(columns)